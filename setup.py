@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
+from setuptools import setup
 
 setup(name='troposphereWrapper',
       version = '0.1.2',
@@ -10,5 +10,10 @@ setup(name='troposphereWrapper',
       packages = ['troposphereWrapper'],
       install_requires = [
           'troposphere', 'awacs'
-      ]
+      ],
+      entry_points = {
+          'console_scripts': [
+              'troposphere-synth = troposphereWrapper.synth:main'
+          ]
+      }
      )
\ No newline at end of file
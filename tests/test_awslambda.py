@@ -0,0 +1,22 @@
+import pytest
+from troposphere.iam import Role
+from troposphere.sqs import Queue
+
+from troposphereWrapper.awslambda import LambdaBuilder, LambdaEventSourceMappingBuilder
+
+
+def _mapping(function: LambdaBuilder) -> LambdaEventSourceMappingBuilder:
+  return LambdaEventSourceMappingBuilder().setName("Orders") \
+    .setFunction(function).setSqsQueue(Queue("OrderQueue"))
+
+
+def test_event_source_policy_uses_function_role():
+  role = Role("WorkerRole", AssumeRolePolicyDocument = {})
+  policy, mapping = _mapping(LambdaBuilder().setName("Worker").setRole(role)).build()
+  assert policy.to_dict()["Properties"]["Roles"] == [ { "Ref": "WorkerRole" } ]
+  assert mapping.DependsOn == policy.title
+
+
+def test_event_source_needs_function_role():
+  with pytest.raises(ValueError):
+    _mapping(LambdaBuilder().setName("Worker")).build()
@@ -0,0 +1,41 @@
+import pytest
+
+from troposphereWrapper.awslambda import LambdaBuilder, MAX_LAYERS
+from troposphereWrapper.codebuild import CodeBuildEnvBuilder
+from troposphereWrapper.general import ParameterBuilder
+from troposphereWrapper.immutable import Immutable
+from troposphereWrapper.pipeline import CodePipelineActionBuilder
+
+
+def test_setter_restores_constructor_default():
+  base = Immutable(LambdaBuilder).setMemory(256)
+  assert base.setMemory(128).materialize()._memory == 128
+  assert base.materialize()._memory == 256
+
+
+def test_boolean_setter_restores_default():
+  env = Immutable(CodeBuildEnvBuilder).setPrivilegedMode(True).setPrivilegedMode(False)
+  assert env.materialize()._privilegedMode is False
+
+
+def test_add_methods_accumulate():
+  param = Immutable(ParameterBuilder).addAllowedValue("dev").addAllowedValue("prod")
+  assert param.materialize()._allowedValues == [ "dev", "prod" ]
+
+
+def test_setter_reads_current_state():
+  action = Immutable(CodePipelineActionBuilder) \
+    .setConfiguration({ "OutputArtifactFormat": "CODEBUILD_CLONE_REF" }) \
+    .setConnectionSource("arn:aws:codestar-connections:::connection/x", "owner/repo", "main")
+  configuration = action.materialize()._configuration
+  assert configuration["OutputArtifactFormat"] == "CODEBUILD_CLONE_REF"
+  assert configuration["BranchName"] == "main"
+
+
+def test_setter_checks_current_state():
+  function = Immutable(LambdaBuilder)
+  for i in range(MAX_LAYERS):
+    function = function.addLayer("arn:aws:lambda:::layer:l%d:1" % i)
+  with pytest.raises(ValueError):
+    function.addLayer("arn:aws:lambda:::layer:extra:1")
+  assert len(function.materialize()._layers) == MAX_LAYERS
@@ -0,0 +1,25 @@
+from troposphereWrapper.awslambda import LambdaBuilder, LambdaRuntime
+from troposphereWrapper.layers import LambdaLayerManager
+
+
+def _function(name: str) -> LambdaBuilder:
+  return LambdaBuilder().setName(name).setRuntime(LambdaRuntime.Python3x) \
+    .addDependency("requests==2.31.0", 1000).addLayer("arn:aws:lambda:::layer:own:1")
+
+
+def test_rebuild_replaces_stale_layers():
+  first, second = _function("First"), _function("Second")
+  manager = LambdaLayerManager().setLayerBucket("bucket") \
+    .addFunction(first).addFunction(second)
+  stale = set(l.title for l in manager.build())
+
+  first.addDependency("boto3==1.34.0", 2000)
+  second.addDependency("boto3==1.34.0", 2000)
+  layers = manager.build()
+  titles = set(l.title for l in layers)
+
+  assert titles and not titles & stale
+  for f in (first, second):
+    attached = [ l for l in f._layers if not isinstance(l, str) ]
+    assert set(l.title for l in attached) == titles
+    assert "arn:aws:lambda:::layer:own:1" in f._layers
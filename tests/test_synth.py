@@ -0,0 +1,21 @@
+from troposphereWrapper.synth import discover
+
+import pytest
+import sys
+
+
+STACK = '''
+from troposphere import Template
+from troposphereWrapper.synth import stack
+
+@stack("Site")
+def site():
+  return Template()
+'''
+
+
+def test_shadowed_stack_module_raises(tmp_path, monkeypatch):
+  (tmp_path / "site.py").write_text(STACK)
+  monkeypatch.setattr(sys, "path", list(sys.path))
+  with pytest.raises(ValueError, match = "shadowed"):
+    discover([ str(tmp_path) ])
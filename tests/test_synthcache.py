@@ -0,0 +1,40 @@
+from troposphereWrapper.synthcache import SynthesisCache
+
+import json
+import sys
+
+
+STACK = '''
+from troposphere import Template
+from common import DESC
+
+def build():
+  t = Template()
+  t.set_description(DESC)
+  return t
+'''
+
+
+def _render(cache: SynthesisCache) -> str:
+  # a new synth run starts without the project modules imported
+  for name in ("stackmod", "common"):
+    sys.modules.pop(name, None)
+  return json.loads(cache.render("stackmod:build"))["Description"]
+
+
+def test_changed_helper_module_invalidates_entry(tmp_path, monkeypatch):
+  project = tmp_path / "project"
+  project.mkdir()
+  (project / "stackmod.py").write_text(STACK)
+  (project / "common.py").write_text('DESC = "first"\n')
+  monkeypatch.syspath_prepend(str(project))
+  monkeypatch.setattr(sys, "dont_write_bytecode", True)
+  cache = SynthesisCache(str(tmp_path / "cache"))
+
+  assert _render(cache) == "first"
+  assert _render(cache) == "first"
+  assert cache.stats()["hits"] == 1
+
+  (project / "common.py").write_text('DESC = "second, longer"\n')
+  assert _render(cache) == "second, longer"
+  assert cache.stats()["misses"] == 2
@@ -1,11 +1,22 @@
-from troposphere.awslambda import Function, Code, MEMORY_VALUES, Environment
-from troposphere.iam import Role
-from troposphere import Join, Ref, GetAtt, Sub
+from troposphere.awslambda import (
+  Function, Code, Environment, LayerVersion, EventSourceMapping, FilterCriteria,
+  Filter, ScalingConfig)
+from troposphere.iam import Role, PolicyType
+from troposphere.sqs import Queue
+from troposphere.kinesis import Stream
+from troposphere.dynamodb import Table
+from troposphere import Join, Ref, GetAtt, Sub, AWSObject
+
+import awacs.sqs
+import awacs.kinesis
+import awacs.dynamodb
 
 from enum import Enum
-from typing import List
+from typing import List, Union
+import json
 
 from .helpers import checkForNoneValues
+from .iam import PolicyBuilder, StatementBuilder, Effects
 
 class LambdaRuntime(Enum):
   Python3x = (1, "python3.6")
@@ -14,6 +25,8 @@ class LambdaRuntime(Enum):
   def __str__(self):
     return self.value[1]
 
+MAX_LAYERS = 5
+
 class LambdaBuilder:
   def __init__(self):
     self._name: str = None
@@ -23,6 +36,8 @@ class LambdaBuilder:
     self._runtime: LambdaRuntime = None
     self._memory: int = 128
     self._envVars: dict = {}
+    self._dependencies: dict = {}
+    self._layers: list = []
 
   def setName(self, name: str):
     self._name = name
@@ -52,9 +67,20 @@ class LambdaBuilder:
     self._memory = memory
     return self
 
+  # requirement as packaged, e.g. "requests==2.31.0", with its unzipped size
+  def addDependency(self, requirement: str, sizeBytes: int = 0):
+    self._dependencies[requirement] = sizeBytes
+    return self
+
+  def addLayer(self, layer: Union[LayerVersion, str]):
+    if len(self._layers) >= MAX_LAYERS:
+      raise ValueError("A function can use at most " + str(MAX_LAYERS) + " layers")
+    self._layers.append(layer)
+    return self
+
   def build(self) -> Function:
     checkForNoneValues(self)
-    return Function(
+    function = Function(
         self._name
       , Code = self._code
       , Handler = self._handler
@@ -64,3 +90,243 @@ class LambdaBuilder:
       , Runtime = str(self._runtime)
       , Environment = Environment( Variables = self._envVars)
       )
+    if self._layers:
+      function.Layers = [ Ref(l) if isinstance(l, LayerVersion) else l
+                          for l in self._layers ]
+    return function
+
+
+
+class EventSourceType(Enum):
+  # (id, name, max batch size, default batch size, is a stream)
+  SQS             = (1, "SQS", 10000, 10, False)
+  Kinesis         = (2, "Kinesis", 10000, 100, True)
+  DynamoDBStreams = (3, "DynamoDBStreams", 10000, 100, True)
+  def __str__(self):
+    return self.value[1]
+
+  def maxBatchSize(self) -> int:
+    return self.value[2]
+
+  def isStream(self) -> bool:
+    return self.value[4]
+
+class StartingPosition(Enum):
+  Latest      = (1, "LATEST")
+  TrimHorizon = (2, "TRIM_HORIZON")
+  def __str__(self):
+    return self.value[1]
+
+SQS_FIFO_MAX_BATCH_SIZE = 10
+SQS_MAX_BATCH_SIZE_WITHOUT_WINDOW = 10
+MAX_BATCHING_WINDOW = 300
+MAX_PARALLELIZATION_FACTOR = 10
+SQS_CONCURRENCY_RANGE = (2, 1000)
+MAX_TUMBLING_WINDOW = 900
+MAX_FILTERS = 5
+
+
+def _sourceArn(source, attribute: str):
+  return GetAtt(source, attribute) if isinstance(source, AWSObject) else source
+
+
+# reads a queue or stream into a LambdaBuilder function; build also adds a
+# policy with only the read actions on that source to the function's role
+class LambdaEventSourceMappingBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._function: LambdaBuilder = None
+    self._sourceType: EventSourceType = None
+    self._source = None
+    self._fifo: bool = False
+    self._batchSize: int = None
+    self._batchingWindow: int = None
+    self._parallelization: int = None
+    self._maxConcurrency: int = None
+    self._bisectOnError: bool = None
+    self._partialBatchResponses: bool = None
+    self._tumblingWindow: int = None
+    self._startingPosition: StartingPosition = None
+    self._filters: List[str] = []
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def setFunction(self, function: LambdaBuilder):
+    self._function = function
+    return self
+
+  def setSqsQueue(self, queue: Union[Queue, str]):
+    self._sourceType = EventSourceType.SQS
+    self._source = _sourceArn(queue, "Arn")
+    self._fifo = isinstance(queue, Queue) and bool(queue.properties.get("FifoQueue"))
+    return self
+
+  def setKinesisStream(self, stream: Union[Stream, str]):
+    self._sourceType = EventSourceType.Kinesis
+    self._source = _sourceArn(stream, "Arn")
+    return self
+
+  def setDynamoDBStream(self, table: Union[Table, str]):
+    if isinstance(table, Table) and "StreamSpecification" not in table.properties:
+      raise ValueError("Table " + table.title + " has no StreamSpecification")
+    self._sourceType = EventSourceType.DynamoDBStreams
+    self._source = _sourceArn(table, "StreamArn")
+    return self
+
+  def setBatchSize(self, batchSize: int):
+    self._batchSize = batchSize
+    return self
+
+  def setMaximumBatchingWindow(self, seconds: int):
+    self._batchingWindow = seconds
+    return self
+
+  def setParallelizationFactor(self, factor: int):
+    self._parallelization = factor
+    return self
+
+  def setMaximumConcurrency(self, concurrency: int):
+    self._maxConcurrency = concurrency
+    return self
+
+  def enableBisectOnError(self):
+    self._bisectOnError = True
+    return self
+
+  # the function returns batchItemFailures instead of failing the whole batch
+  def enablePartialBatchResponses(self):
+    self._partialBatchResponses = True
+    return self
+
+  def setTumblingWindow(self, seconds: int):
+    self._tumblingWindow = seconds
+    return self
+
+  def setStartingPosition(self, position: StartingPosition):
+    self._startingPosition = position
+    return self
+
+  # pattern as a dict or its JSON, e.g. {"body": {"type": ["order"]}}
+  def addFilter(self, pattern: Union[dict, str]):
+    if isinstance(pattern, str):
+      json.loads(pattern)
+    else:
+      pattern = json.dumps(pattern, sort_keys = True)
+    self._filters.append(pattern)
+    return self
+
+  def _validate(self):
+    sourceType = self._sourceType
+    def streamOnly(value, option: str):
+      if value is not None and not sourceType.isStream():
+        raise ValueError(option + " is only supported for Kinesis and DynamoDB streams")
+    def inRange(value, low: int, high: int, option: str):
+      if value is not None and not low <= value <= high:
+        raise ValueError("%s of %s must be between %d and %d"
+                         % (option, self._name, low, high))
+
+    maxBatchSize = sourceType.maxBatchSize()
+    if self._fifo:
+      maxBatchSize = SQS_FIFO_MAX_BATCH_SIZE
+    inRange(self._batchSize, 1, maxBatchSize, "BatchSize")
+    inRange(self._batchingWindow, 0, MAX_BATCHING_WINDOW, "MaximumBatchingWindowInSeconds")
+    if sourceType == EventSourceType.SQS \
+        and (self._batchSize or 0) > SQS_MAX_BATCH_SIZE_WITHOUT_WINDOW \
+        and not self._batchingWindow:
+      raise ValueError("SQS batches above %d need a batching window of at least 1 second"
+                       % SQS_MAX_BATCH_SIZE_WITHOUT_WINDOW)
+    streamOnly(self._parallelization, "ParallelizationFactor")
+    inRange(self._parallelization, 1, MAX_PARALLELIZATION_FACTOR, "ParallelizationFactor")
+    streamOnly(self._bisectOnError, "BisectBatchOnFunctionError")
+    streamOnly(self._tumblingWindow, "TumblingWindowInSeconds")
+    inRange(self._tumblingWindow, 0, MAX_TUMBLING_WINDOW, "TumblingWindowInSeconds")
+    streamOnly(self._startingPosition, "StartingPosition")
+    if self._maxConcurrency is not None and sourceType != EventSourceType.SQS:
+      raise ValueError("MaximumConcurrency is only supported for SQS")
+    inRange(self._maxConcurrency, *SQS_CONCURRENCY_RANGE, "MaximumConcurrency")
+    if len(self._filters) > MAX_FILTERS:
+      raise ValueError("An event source mapping supports at most %d filters" % MAX_FILTERS)
+
+  def _readActions(self) -> list:
+    if self._sourceType == EventSourceType.SQS:
+      return [ awacs.sqs.ReceiveMessage
+             , awacs.sqs.DeleteMessage
+             , awacs.sqs.GetQueueAttributes
+             ]
+    if self._sourceType == EventSourceType.Kinesis:
+      return [ awacs.kinesis.DescribeStream
+             , awacs.kinesis.DescribeStreamSummary
+             , awacs.kinesis.GetRecords
+             , awacs.kinesis.GetShardIterator
+             , awacs.kinesis.ListShards
+             ]
+    return [ awacs.dynamodb.DescribeStream
+           , awacs.dynamodb.GetRecords
+           , awacs.dynamodb.GetShardIterator
+           ]
+
+  # read permissions as a separate AWS::IAM::Policy on the role the function
+  # runs as, so the role does not have to be built after the mapping
+  def buildPolicy(self) -> PolicyType:
+    if not isinstance(self._function._role, Role):
+      raise ValueError("Function " + str(self._function._name) + " needs a role")
+    statement = StatementBuilder() \
+      .setEffect(Effects.Allow) \
+      .addResource(self._source)
+    for action in self._readActions():
+      statement.addAction(action)
+    policy = PolicyBuilder() \
+      .setName(self._name + "EventSourceRead") \
+      .addStatement(statement.build())
+    if self._sourceType == EventSourceType.DynamoDBStreams:
+      # ListStreams does not support resource-level permissions
+      policy.addStatement(
+        StatementBuilder() \
+          .setEffect(Effects.Allow) \
+          .addAction(awacs.dynamodb.ListStreams) \
+          .addResource("*") \
+          .build()
+        )
+    policy = policy.build()
+    return PolicyType(
+        self._name + "EventSourceRead"
+      , PolicyName = policy.PolicyName
+      , PolicyDocument = policy.PolicyDocument
+      , Roles = [ Ref(self._function._role) ]
+      )
+
+  # the policy and the mapping, which waits for the policy so it can poll
+  def build(self) -> List[AWSObject]:
+    optional = [ "_batchSize", "_batchingWindow", "_parallelization"
+               , "_maxConcurrency", "_bisectOnError", "_partialBatchResponses"
+               , "_tumblingWindow", "_startingPosition" ]
+    checkForNoneValues(self, optional = optional)
+    self._validate()
+    policy = self.buildPolicy()
+    mapping = EventSourceMapping(
+        self._name
+      , EventSourceArn = self._source
+      , FunctionName = Ref(self._function._name)
+      , BatchSize = self._batchSize or self._sourceType.value[3]
+      , DependsOn = policy.title
+      )
+    if self._batchingWindow is not None:
+      mapping.MaximumBatchingWindowInSeconds = self._batchingWindow
+    if self._parallelization is not None:
+      mapping.ParallelizationFactor = self._parallelization
+    if self._maxConcurrency is not None:
+      mapping.ScalingConfig = ScalingConfig(MaximumConcurrency = self._maxConcurrency)
+    if self._bisectOnError:
+      mapping.BisectBatchOnFunctionError = True
+    if self._partialBatchResponses:
+      mapping.FunctionResponseTypes = [ "ReportBatchItemFailures" ]
+    if self._tumblingWindow is not None:
+      mapping.TumblingWindowInSeconds = self._tumblingWindow
+    if self._sourceType.isStream():
+      mapping.StartingPosition = str(self._startingPosition or StartingPosition.Latest)
+    if self._filters:
+      mapping.FilterCriteria = FilterCriteria(
+        Filters = [ Filter(Pattern = p) for p in self._filters ])
+    return [ policy, mapping ]
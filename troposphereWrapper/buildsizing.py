@@ -0,0 +1,223 @@
+from .codebuild import CodeBuildBuilder, CBComputeType, CBEnvironmentType
+
+from typing import List, NamedTuple
+import csv
+import json
+import math
+import statistics
+
+
+# approximate on-demand prices in USD per minute (us-east-1), override with
+# CodeBuildSizingAdvisor.setPrice for other regions or negotiated rates
+DEFAULT_PRICES = {
+    ('LINUX_CONTAINER', 'BUILD_GENERAL1_SMALL'): 0.005
+  , ('LINUX_CONTAINER', 'BUILD_GENERAL1_MEDIUM'): 0.01
+  , ('LINUX_CONTAINER', 'BUILD_GENERAL1_LARGE'): 0.02
+  , ('LINUX_CONTAINER', 'BUILD_GENERAL1_XLARGE'): 0.04
+  , ('LINUX_CONTAINER', 'BUILD_GENERAL1_2XLARGE'): 0.08
+  , ('LINUX_GPU_CONTAINER', 'BUILD_GENERAL1_LARGE'): 0.18
+  , ('ARM_CONTAINER', 'BUILD_GENERAL1_SMALL'): 0.0034
+  , ('ARM_CONTAINER', 'BUILD_GENERAL1_MEDIUM'): 0.007
+  , ('ARM_CONTAINER', 'BUILD_GENERAL1_LARGE'): 0.0136
+  , ('ARM_CONTAINER', 'BUILD_GENERAL1_XLARGE'): 0.0272
+  , ('ARM_CONTAINER', 'BUILD_GENERAL1_2XLARGE'): 0.0544
+  , ('WINDOWS_SERVER_2019_CONTAINER', 'BUILD_GENERAL1_MEDIUM'): 0.02
+  , ('WINDOWS_SERVER_2019_CONTAINER', 'BUILD_GENERAL1_LARGE'): 0.04
+  , ('WINDOWS_SERVER_2022_CONTAINER', 'BUILD_GENERAL1_MEDIUM'): 0.02
+  , ('WINDOWS_SERVER_2022_CONTAINER', 'BUILD_GENERAL1_LARGE'): 0.04
+  , ('LINUX_LAMBDA_CONTAINER', 'BUILD_LAMBDA_1GB'): 0.0006
+  , ('LINUX_LAMBDA_CONTAINER', 'BUILD_LAMBDA_2GB'): 0.0012
+  , ('LINUX_LAMBDA_CONTAINER', 'BUILD_LAMBDA_4GB'): 0.0024
+  , ('LINUX_LAMBDA_CONTAINER', 'BUILD_LAMBDA_8GB'): 0.0048
+  , ('LINUX_LAMBDA_CONTAINER', 'BUILD_LAMBDA_10GB'): 0.006
+  , ('ARM_LAMBDA_CONTAINER', 'BUILD_LAMBDA_1GB'): 0.0005
+  , ('ARM_LAMBDA_CONTAINER', 'BUILD_LAMBDA_2GB'): 0.001
+  , ('ARM_LAMBDA_CONTAINER', 'BUILD_LAMBDA_4GB'): 0.002
+  , ('ARM_LAMBDA_CONTAINER', 'BUILD_LAMBDA_8GB'): 0.004
+  , ('ARM_LAMBDA_CONTAINER', 'BUILD_LAMBDA_10GB'): 0.005
+  }
+
+# lambda compute stops builds after 15 minutes
+LAMBDA_MAX_DURATION = 15 * 60
+
+
+class BuildRecord(NamedTuple):
+  project: str
+  computeType: str
+  durationSeconds: float
+  queuedSeconds: float
+
+
+class SizingEstimate(NamedTuple):
+  computeType: str
+  durationSeconds: float
+  queuedSeconds: float
+  costPerBuild: float
+  score: float
+
+
+class SizingRecommendation(NamedTuple):
+  project: str
+  current: str
+  recommended: str
+  estimates: List[SizingEstimate]
+
+
+def loadBuildHistory(path: str) -> List[BuildRecord]:
+  with open(path, newline = "") as f:
+    if path.endswith(".csv"):
+      rows = list(csv.DictReader(f))
+    else:
+      rows = json.load(f)
+      if isinstance(rows, dict):
+        rows = rows["builds"]
+  return [ BuildRecord( project = r["project"]
+                      , computeType = r["computeType"]
+                      , durationSeconds = float(r["durationSeconds"])
+                      , queuedSeconds = float(r.get("queuedSeconds") or 0)
+                      )
+           for r in rows ]
+
+
+class CodeBuildSizingAdvisor:
+  def __init__(self):
+    self._records: List[BuildRecord] = []
+    self._prices: dict = dict(DEFAULT_PRICES)
+    self._latencyValue: float = 0.0
+    self._parallelFraction: float = 0.5
+    self._maxDuration: float = None
+
+  def addRecords(self, records: List[BuildRecord]):
+    self._records.extend(records)
+    return self
+
+  def loadHistory(self, path: str):
+    return self.addRecords(loadBuildHistory(path))
+
+  def setPrice(self, envType: CBEnvironmentType, compType: CBComputeType, perMinute: float):
+    self._prices[(str(envType), str(compType))] = perMinute
+    return self
+
+  # dollars a minute of waiting for a build is worth, 0 optimizes for cost only
+  def setLatencyValue(self, dollarsPerMinute: float):
+    self._latencyValue = dollarsPerMinute
+    return self
+
+  # share of the build that scales with vCPUs, used when a project has only
+  # been observed on one compute type
+  def setDefaultParallelFraction(self, fraction: float):
+    if not 0 <= fraction <= 1:
+      raise ValueError("Parallel fraction must be between 0 and 1")
+    self._parallelFraction = fraction
+    return self
+
+  def setMaxDuration(self, seconds: float):
+    self._maxDuration = seconds
+    return self
+
+  def _observed(self, project: str) -> dict:
+    durations = {}
+    for r in self._records:
+      if r.project == project:
+        durations.setdefault(r.computeType, []).append(r)
+    return durations
+
+  def _queueTimes(self, records) -> dict:
+    queued = {}
+    for r in records:
+      queued.setdefault(r.computeType, []).append(r.queuedSeconds)
+    return { c: statistics.median(xs) for c, xs in queued.items() }
+
+  # the project's own median queue time per compute type; types it never ran
+  # on fall back to the median of all projects, and types nobody ran on to
+  # the longest queue seen so unmeasured sizes are not favoured
+  def _projectQueueTimes(self, observed: dict) -> dict:
+    queueTimes = dict(self._queueTimes(self._records))
+    queueTimes.update(self._queueTimes(r for rs in observed.values() for r in rs))
+    return queueTimes
+
+  # fits Amdahl's law t = serial + parallel / vcpus to the observed medians
+  def _fit(self, medians: dict):
+    points = [ (1.0 / CBComputeType.fromString(c).vcpus(), t)
+               for c, t in medians.items()
+               if CBComputeType.fromString(c) is not None ]
+    if len(points) >= 2:
+      mx = sum(x for x, _ in points) / len(points)
+      my = sum(y for _, y in points) / len(points)
+      sxx = sum((x - mx) ** 2 for x, _ in points)
+      if sxx > 0:
+        parallel = sum((x - mx) * (y - my) for x, y in points) / sxx
+        parallel = max(parallel, 0.0)
+        serial = max(my - parallel * mx, 0.0)
+        return serial, parallel
+    x, t = min(points, key = lambda p: p[0]) if points else (1.0, 0.0)
+    parallel = t * self._parallelFraction / x
+    return t * (1 - self._parallelFraction), parallel
+
+  def _cost(self, envType: str, compType: CBComputeType, seconds: float) -> float:
+    price = self._prices.get((envType, str(compType)))
+    if price is None:
+      return None
+    if compType.isLambda():
+      return price * seconds / 60
+    return price * math.ceil(seconds / 60)
+
+  def estimate(self, project: str, envType: str) -> List[SizingEstimate]:
+    observed = self._observed(project)
+    if not observed:
+      raise ValueError("No build history for project " + project)
+    env = CBEnvironmentType.fromString(envType)
+    if env is None:
+      raise ValueError("Unknown environment type " + envType)
+    medians = { c: statistics.median(r.durationSeconds for r in rs)
+                for c, rs in observed.items() }
+    serial, parallel = self._fit(medians)
+    queueTimes = self._projectQueueTimes(observed)
+    unobservedQueue = max(queueTimes.values())
+    estimates = []
+    for compType in env.computeTypes():
+      name = str(compType)
+      duration = medians.get(name, serial + parallel / compType.vcpus())
+      if compType.isLambda() and duration > LAMBDA_MAX_DURATION:
+        continue
+      if self._maxDuration is not None and duration > self._maxDuration:
+        continue
+      cost = self._cost(envType, compType, duration)
+      if cost is None:
+        continue
+      queued = queueTimes.get(name, unobservedQueue)
+      score = cost + self._latencyValue * (duration + queued) / 60
+      estimates.append(SizingEstimate(name, duration, queued, cost, score))
+    return sorted(estimates, key = lambda e: e.score)
+
+  def recommend(self, builder: CodeBuildBuilder) -> SizingRecommendation:
+    env = builder._env
+    estimates = self.estimate(builder._name, env.Type)
+    if not estimates:
+      raise ValueError("No compute type satisfies the constraints for "
+                       + builder._name)
+    return SizingRecommendation( project = builder._name
+                               , current = env.ComputeType
+                               , recommended = estimates[0].computeType
+                               , estimates = estimates
+                               )
+
+  def apply(self, builders: List[CodeBuildBuilder]) -> List[SizingRecommendation]:
+    recommendations = []
+    for builder in builders:
+      if not self._observed(builder._name):
+        continue
+      recommendation = self.recommend(builder)
+      builder._env.ComputeType = recommendation.recommended
+      recommendations.append(recommendation)
+    return recommendations
+
+
+def formatRecommendations(recommendations: List[SizingRecommendation]) -> str:
+  lines = []
+  for r in recommendations:
+    lines.append(r.project + ": " + r.current + " -> " + r.recommended)
+    for e in r.estimates:
+      lines.append("  %-24s %7.0fs build %6.0fs queue  $%.4f/build"
+                   % (e.computeType, e.durationSeconds, e.queuedSeconds, e.costPerBuild))
+  return "\n".join(lines)
@@ -0,0 +1,398 @@
+from troposphere import Template, Ref, Sub, GetAtt, AWSObject
+from troposphere.cloudfront import (
+  Distribution, DistributionConfig, Origin, S3OriginConfig, CacheBehavior,
+  DefaultCacheBehavior, CachePolicy, CachePolicyConfig,
+  ParametersInCacheKeyAndForwardedToOrigin, CacheCookiesConfig,
+  CacheHeadersConfig, CacheQueryStringsConfig, OriginRequestPolicy,
+  OriginRequestPolicyConfig, OriginRequestCookiesConfig,
+  OriginRequestHeadersConfig, OriginRequestQueryStringsConfig,
+  OriginAccessControl, OriginAccessControlConfig, CustomErrorResponse)
+from troposphere.s3 import Bucket
+
+from .helpers import checkForNoneValues
+from .iam import RoleBuilderHelper
+from .s3 import S3Builder, S3Access
+
+from enum import Enum
+from typing import List, Union
+
+
+class ManagedCachePolicy(Enum):
+  CachingOptimized  = (1, "658327ea-f89d-4fab-a63d-7e88639e58f6")
+  CachingDisabled   = (2, "4135ea2d-6df8-44a3-9df3-4b5a84be39ad")
+  def __str__(self):
+    return self.value[1]
+
+class ManagedOriginRequestPolicy(Enum):
+  CORSS3Origin      = (1, "88a5eaf4-2fd4-4709-b370-b4c650ea3fcf")
+  UserAgentRefererHeaders = (2, "acba4595-bd28-49b8-b9fe-13317c0390fa")
+  def __str__(self):
+    return self.value[1]
+
+class ViewerProtocolPolicy(Enum):
+  AllowAll          = (1, "allow-all")
+  RedirectToHttps   = (2, "redirect-to-https")
+  HttpsOnly         = (3, "https-only")
+  def __str__(self):
+    return self.value[1]
+
+class PriceClass(Enum):
+  All               = (1, "PriceClass_All")
+  Class200          = (2, "PriceClass_200")
+  Class100          = (3, "PriceClass_100")
+  def __str__(self):
+    return self.value[1]
+
+
+def _policyId(policy):
+  if isinstance(policy, AWSObject):
+    return Ref(policy)
+  return str(policy)
+
+
+class CloudFrontCachePolicyBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._minTTL: int = 0
+    self._defaultTTL: int = 86400
+    self._maxTTL: int = 31536000
+    self._brotli: bool = True
+    self._gzip: bool = True
+    self._headers: List[str] = []
+    self._cookies: List[str] = []
+    self._queryStrings: List[str] = []
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def setTTLs(self, minTTL: int, defaultTTL: int, maxTTL: int):
+    if not minTTL <= defaultTTL <= maxTTL:
+      raise ValueError("TTLs must satisfy min <= default <= max")
+    self._minTTL = minTTL
+    self._defaultTTL = defaultTTL
+    self._maxTTL = maxTTL
+    return self
+
+  def setCompression(self, brotli: bool, gzip: bool):
+    self._brotli = brotli
+    self._gzip = gzip
+    return self
+
+  def addHeader(self, header: str):
+    self._headers.append(header)
+    return self
+
+  def addCookie(self, cookie: str):
+    self._cookies.append(cookie)
+    return self
+
+  def addQueryString(self, queryString: str):
+    self._queryStrings.append(queryString)
+    return self
+
+  def build(self) -> CachePolicy:
+    checkForNoneValues(self)
+    headers = CacheHeadersConfig( HeaderBehavior = "none" )
+    if self._headers:
+      headers = CacheHeadersConfig( HeaderBehavior = "whitelist"
+                                  , Headers = self._headers
+                                  )
+    cookies = CacheCookiesConfig( CookieBehavior = "none" )
+    if self._cookies:
+      cookies = CacheCookiesConfig( CookieBehavior = "whitelist"
+                                  , Cookies = self._cookies
+                                  )
+    queryStrings = CacheQueryStringsConfig( QueryStringBehavior = "none" )
+    if self._queryStrings:
+      queryStrings = CacheQueryStringsConfig( QueryStringBehavior = "whitelist"
+                                            , QueryStrings = self._queryStrings
+                                            )
+    keyParams = ParametersInCacheKeyAndForwardedToOrigin(
+        EnableAcceptEncodingBrotli = self._brotli
+      , EnableAcceptEncodingGzip = self._gzip
+      , HeadersConfig = headers
+      , CookiesConfig = cookies
+      , QueryStringsConfig = queryStrings
+      )
+    return CachePolicy(
+        self._name
+      , CachePolicyConfig = CachePolicyConfig(
+            Name = Sub(self._name + "-${AWS::StackName}")
+          , MinTTL = self._minTTL
+          , DefaultTTL = self._defaultTTL
+          , MaxTTL = self._maxTTL
+          , ParametersInCacheKeyAndForwardedToOrigin = keyParams
+          )
+      )
+
+
+class CloudFrontOriginRequestPolicyBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._headers: List[str] = []
+    self._cookies: List[str] = []
+    self._queryStrings: List[str] = []
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def addHeader(self, header: str):
+    self._headers.append(header)
+    return self
+
+  def addCookie(self, cookie: str):
+    self._cookies.append(cookie)
+    return self
+
+  def addQueryString(self, queryString: str):
+    self._queryStrings.append(queryString)
+    return self
+
+  def build(self) -> OriginRequestPolicy:
+    checkForNoneValues(self)
+    headers = OriginRequestHeadersConfig( HeaderBehavior = "none" )
+    if self._headers:
+      headers = OriginRequestHeadersConfig( HeaderBehavior = "whitelist"
+                                          , Headers = self._headers
+                                          )
+    cookies = OriginRequestCookiesConfig( CookieBehavior = "none" )
+    if self._cookies:
+      cookies = OriginRequestCookiesConfig( CookieBehavior = "whitelist"
+                                          , Cookies = self._cookies
+                                          )
+    queryStrings = OriginRequestQueryStringsConfig( QueryStringBehavior = "none" )
+    if self._queryStrings:
+      queryStrings = OriginRequestQueryStringsConfig(
+          QueryStringBehavior = "whitelist"
+        , QueryStrings = self._queryStrings
+        )
+    return OriginRequestPolicy(
+        self._name
+      , OriginRequestPolicyConfig = OriginRequestPolicyConfig(
+            Name = Sub(self._name + "-${AWS::StackName}")
+          , HeadersConfig = headers
+          , CookiesConfig = cookies
+          , QueryStringsConfig = queryStrings
+          )
+      )
+
+
+class CloudFrontOriginAccessControlBuilder:
+  def __init__(self):
+    self._name: str = None
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def build(self) -> OriginAccessControl:
+    checkForNoneValues(self)
+    return OriginAccessControl(
+        self._name
+      , OriginAccessControlConfig = OriginAccessControlConfig(
+            Name = Sub(self._name + "-${AWS::StackName}")
+          , OriginAccessControlOriginType = "s3"
+          , SigningBehavior = "always"
+          , SigningProtocol = "sigv4"
+          )
+      )
+
+
+class CloudFrontCacheBehaviorBuilder:
+  def __init__(self):
+    self._pathPattern: str = None
+    self._targetOriginId: str = None
+    self._cachePolicy: Union[CachePolicy, ManagedCachePolicy] = None
+    self._originRequestPolicy: Union[OriginRequestPolicy, ManagedOriginRequestPolicy] = None
+    self._viewerProtocolPolicy: ViewerProtocolPolicy = ViewerProtocolPolicy.RedirectToHttps
+    self._compress: bool = True
+
+  def setPathPattern(self, pathPattern: str):
+    self._pathPattern = pathPattern
+    return self
+
+  def setTargetOriginId(self, originId: str):
+    self._targetOriginId = originId
+    return self
+
+  def setCachePolicy(self, policy: Union[CachePolicy, ManagedCachePolicy]):
+    self._cachePolicy = policy
+    return self
+
+  def setOriginRequestPolicy(self, policy: Union[OriginRequestPolicy, ManagedOriginRequestPolicy]):
+    self._originRequestPolicy = policy
+    return self
+
+  def setViewerProtocolPolicy(self, policy: ViewerProtocolPolicy):
+    self._viewerProtocolPolicy = policy
+    return self
+
+  def setCompress(self, compress: bool):
+    self._compress = compress
+    return self
+
+  def _properties(self) -> dict:
+    props = dict( TargetOriginId = self._targetOriginId
+                , CachePolicyId = _policyId(self._cachePolicy)
+                , ViewerProtocolPolicy = str(self._viewerProtocolPolicy)
+                , Compress = self._compress
+                , AllowedMethods = ["GET", "HEAD"]
+                , CachedMethods = ["GET", "HEAD"]
+                )
+    if self._originRequestPolicy is not None:
+      props["OriginRequestPolicyId"] = _policyId(self._originRequestPolicy)
+    return props
+
+  def build(self) -> CacheBehavior:
+    checkForNoneValues(self, optional = ["_originRequestPolicy"])
+    return CacheBehavior( PathPattern = self._pathPattern, **self._properties() )
+
+  def buildDefault(self) -> DefaultCacheBehavior:
+    checkForNoneValues(self, optional = ["_originRequestPolicy", "_pathPattern"])
+    return DefaultCacheBehavior( **self._properties() )
+
+
+# companion of S3StaticWebsiteBuilder: serves a private bucket through
+# CloudFront, build() returns all resources including the bucket policy
+class CloudFrontWebsiteBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._bucket: Bucket = None
+    self._indexDoc: str = "index.html"
+    self._priceClass: PriceClass = PriceClass.Class100
+    self._httpVersion: str = "http2and3"
+    self._originRequestPolicy = None
+    self._assetPaths: List[str] = []
+    self._assetTTL: int = 31536000
+    self._indexTTL: int = 60
+    self._behaviors: List[CacheBehavior] = []
+    self._spaFallback: bool = False
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def setBucket(self, bucket: Bucket):
+    self._bucket = bucket
+    return self
+
+  def setIndexDocument(self, indexDoc: str):
+    self._indexDoc = indexDoc
+    return self
+
+  def setPriceClass(self, priceClass: PriceClass):
+    self._priceClass = priceClass
+    return self
+
+  def setHttpVersion(self, httpVersion: str):
+    self._httpVersion = httpVersion
+    return self
+
+  def setOriginRequestPolicy(self, policy: Union[OriginRequestPolicy, ManagedOriginRequestPolicy]):
+    self._originRequestPolicy = policy
+    return self
+
+  def addHashedAssetsPath(self, pathPattern: str):
+    self._assetPaths.append(pathPattern)
+    return self
+
+  def setAssetTTL(self, ttl: int):
+    self._assetTTL = ttl
+    return self
+
+  def setIndexTTL(self, ttl: int):
+    self._indexTTL = ttl
+    return self
+
+  def addCacheBehavior(self, behavior: CacheBehavior):
+    self._behaviors.append(behavior)
+    return self
+
+  def setSpaFallback(self, fallback: bool):
+    self._spaFallback = fallback
+    return self
+
+  def build(self) -> List[AWSObject]:
+    checkForNoneValues(self, optional = ["_originRequestPolicy"])
+    originId = self._bucket.title + "Origin"
+
+    oac = CloudFrontOriginAccessControlBuilder() \
+      .setName(self._name + "OAC") \
+      .build()
+    assetPolicy = CloudFrontCachePolicyBuilder() \
+      .setName(self._name + "AssetCachePolicy") \
+      .setTTLs(self._assetTTL, self._assetTTL, self._assetTTL) \
+      .build()
+    indexPolicy = CloudFrontCachePolicyBuilder() \
+      .setName(self._name + "IndexCachePolicy") \
+      .setTTLs(0, self._indexTTL, self._indexTTL) \
+      .build()
+
+    def behavior(policy):
+      b = CloudFrontCacheBehaviorBuilder() \
+        .setTargetOriginId(originId) \
+        .setCachePolicy(policy)
+      if self._originRequestPolicy is not None:
+        b.setOriginRequestPolicy(self._originRequestPolicy)
+      return b
+
+    behaviors = [ behavior(assetPolicy).setPathPattern(path).build()
+                  for path in self._assetPaths ]
+    behaviors.append(behavior(indexPolicy).setPathPattern("/" + self._indexDoc).build())
+    behaviors.extend(self._behaviors)
+
+    errorResponses = []
+    if self._spaFallback:
+      errorResponses = [ CustomErrorResponse( ErrorCode = code
+                                            , ResponseCode = 200
+                                            , ResponsePagePath = "/" + self._indexDoc
+                                            , ErrorCachingMinTTL = 0
+                                            )
+                         for code in (403, 404) ]
+
+    origin = Origin( Id = originId
+                   , DomainName = GetAtt(self._bucket, "RegionalDomainName")
+                   , OriginAccessControlId = GetAtt(oac, "Id")
+                   , S3OriginConfig = S3OriginConfig( OriginAccessIdentity = "" )
+                   )
+    distribution = Distribution(
+        self._name
+      , DistributionConfig = DistributionConfig(
+            Enabled = True
+          , Origins = [ origin ]
+          , DefaultRootObject = self._indexDoc
+          , DefaultCacheBehavior = behavior(indexPolicy).buildDefault()
+          , CacheBehaviors = behaviors
+          , CustomErrorResponses = errorResponses
+          , HttpVersion = self._httpVersion
+          , IPV6Enabled = True
+          , PriceClass = str(self._priceClass)
+          )
+      )
+    bucketPolicy = RoleBuilderHelper() \
+      .cloudFrontReadForS3Buckets(self._bucket, distribution)
+
+    resources = [ oac, assetPolicy, indexPolicy ]
+    if isinstance(self._originRequestPolicy, AWSObject):
+      resources.append(self._originRequestPolicy)
+    return resources + [ distribution, bucketPolicy ]
+
+
+def getExample() -> str:
+  bucket = S3Builder() \
+    .setName("ExampleWebsiteBucket") \
+    .setAccess(S3Access.Private) \
+    .build()
+
+  t = Template()
+  t.add_resource(bucket)
+  for resource in CloudFrontWebsiteBuilder() \
+      .setName("ExampleWebsiteCDN") \
+      .setBucket(bucket) \
+      .addHashedAssetsPath("/static/*") \
+      .setSpaFallback(True) \
+      .build():
+    t.add_resource(resource)
+  return t.to_json()
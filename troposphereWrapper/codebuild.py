@@ -1,8 +1,13 @@
 from .helpers import checkForNoneValues
-from troposphere.codebuild import Source, Environment, Artifacts, Project
-from troposphere import Sub, Template
+from troposphere.codebuild import (
+  Source, Environment, Artifacts, Project, ProjectBuildBatchConfig,
+  BatchRestrictions, Fleet, ProjectFleet)
+from troposphere import Sub, Template, GetAtt
 
 from enum import Enum
+from typing import List, Union
+import json
+import re
 from .helpers import checkForNoneValues
 
 
@@ -21,6 +26,73 @@ class CBSourceType(Enum):
   def __str__(self):
         return self.value[1]
 
+class CBComputeType(Enum):
+  # (id, name, vCPUs, memory in GiB)
+  Small         = (1, 'BUILD_GENERAL1_SMALL', 2, 3)
+  Medium        = (2, 'BUILD_GENERAL1_MEDIUM', 4, 7)
+  Large         = (3, 'BUILD_GENERAL1_LARGE', 8, 15)
+  XLarge        = (4, 'BUILD_GENERAL1_XLARGE', 36, 70)
+  XXLarge       = (5, 'BUILD_GENERAL1_2XLARGE', 72, 145)
+  Lambda1GB     = (6, 'BUILD_LAMBDA_1GB', 0.6, 1)
+  Lambda2GB     = (7, 'BUILD_LAMBDA_2GB', 1.2, 2)
+  Lambda4GB     = (8, 'BUILD_LAMBDA_4GB', 2.3, 4)
+  Lambda8GB     = (9, 'BUILD_LAMBDA_8GB', 4.6, 8)
+  Lambda10GB    = (10, 'BUILD_LAMBDA_10GB', 5.8, 10)
+  def __str__(self):
+        return self.value[1]
+  def vcpus(self) -> float:
+        return self.value[2]
+  def isLambda(self) -> bool:
+        return self.value[1].startswith('BUILD_LAMBDA_')
+  @staticmethod
+  def fromString(compType: str):
+        return next((c for c in CBComputeType if str(c) == compType), None)
+
+class CBEnvironmentType(Enum):
+  # (id, name, compatible compute types)
+  LinuxContainer      = (1, 'LINUX_CONTAINER', ('Small', 'Medium', 'Large', 'XLarge', 'XXLarge'))
+  LinuxGpuContainer   = (2, 'LINUX_GPU_CONTAINER', ('Large',))
+  ArmContainer        = (3, 'ARM_CONTAINER', ('Small', 'Medium', 'Large', 'XLarge', 'XXLarge'))
+  Windows2019         = (4, 'WINDOWS_SERVER_2019_CONTAINER', ('Medium', 'Large'))
+  Windows2022         = (5, 'WINDOWS_SERVER_2022_CONTAINER', ('Medium', 'Large'))
+  LinuxLambda         = (6, 'LINUX_LAMBDA_CONTAINER', ('Lambda1GB', 'Lambda2GB', 'Lambda4GB', 'Lambda8GB', 'Lambda10GB'))
+  ArmLambda           = (7, 'ARM_LAMBDA_CONTAINER', ('Lambda1GB', 'Lambda2GB', 'Lambda4GB', 'Lambda8GB', 'Lambda10GB'))
+  LinuxEC2            = (8, 'LINUX_EC2', ('Small', 'Medium', 'Large', 'XLarge', 'XXLarge'))
+  ArmEC2              = (9, 'ARM_EC2', ('Small', 'Medium', 'Large', 'XLarge', 'XXLarge'))
+  WindowsEC2          = (10, 'WINDOWS_EC2', ('Medium', 'Large', 'XLarge', 'XXLarge'))
+  def __str__(self):
+        return self.value[1]
+  def computeTypes(self) -> List[CBComputeType]:
+        return [ CBComputeType[c] for c in self.value[2] ]
+  @staticmethod
+  def fromString(envType: str):
+        return next((e for e in CBEnvironmentType if str(e) == envType), None)
+
+class CBImage(Enum):
+  Standard7             = (1, 'aws/codebuild/standard:7.0')
+  AmazonLinux2x86       = (2, 'aws/codebuild/amazonlinux2-x86_64-standard:5.0')
+  AmazonLinux2Arm       = (3, 'aws/codebuild/amazonlinux2-aarch64-standard:3.0')
+  Windows2019           = (4, 'aws/codebuild/windows-base:2019-3.0')
+  Windows2022           = (5, 'aws/codebuild/windows-base:2022-1.0')
+  LambdaPython312       = (6, 'aws/codebuild/amazonlinux-x86_64-lambda-standard:python3.12')
+  LambdaNodejs20        = (7, 'aws/codebuild/amazonlinux-x86_64-lambda-standard:nodejs20')
+  LambdaArmPython312    = (8, 'aws/codebuild/amazonlinux-aarch64-lambda-standard:python3.12')
+  LambdaArmNodejs20     = (9, 'aws/codebuild/amazonlinux-aarch64-lambda-standard:nodejs20')
+  def __str__(self):
+        return self.value[1]
+
+class CBFleetOverflowBehavior(Enum):
+  Queue         = (1, 'QUEUE')
+  OnDemand      = (2, 'ON_DEMAND')
+  def __str__(self):
+        return self.value[1]
+
+class CBBatchReportMode(Enum):
+  IndividualBuilds  = (1, 'REPORT_INDIVIDUAL_BUILDS')
+  AggregatedBatch   = (2, 'REPORT_AGGREGATED_BATCH')
+  def __str__(self):
+        return self.value[1]
+
 
 class CodeBuildBuilder:
   def __init__(self):
@@ -29,6 +101,7 @@ class CodeBuildBuilder:
     self._artifacts: Artifacts = None
     self._name: str = None
     self._serviceRole: str = None
+    self._batchConfig: ProjectBuildBatchConfig = None
 
   def setEnvironment(self, env: Environment):
     self._env = env
@@ -49,16 +122,23 @@ class CodeBuildBuilder:
   def setServiceRole(self, serviceRole: str):
     self._serviceRole = serviceRole
     return self
+
+  def setBuildBatchConfig(self, batchConfig: ProjectBuildBatchConfig):
+    self._batchConfig = batchConfig
+    return self
   
   def build(self) -> Project:
-    checkForNoneValues(self)
-    return Project( self._name
-                  , Name = Sub(self._name + "-${AWS::StackName}")
-                  , Environment = self._env
-                  , Source = self._source
-                  , Artifacts = self._artifacts
-                  , ServiceRole = self._serviceRole
-                  )
+    checkForNoneValues(self, optional = ["_batchConfig"])
+    project = Project( self._name
+                     , Name = Sub(self._name + "-${AWS::StackName}")
+                     , Environment = self._env
+                     , Source = self._source
+                     , Artifacts = self._artifacts
+                     , ServiceRole = self._serviceRole
+                     )
+    if self._batchConfig is not None:
+      project.BuildBatchConfig = self._batchConfig
+    return project
 
 class CodeBuildEnvBuilder:
   def __init__(self):
@@ -67,17 +147,22 @@ class CodeBuildEnvBuilder:
     self._type: str = None
     self._envVars: list = []
     self._privilegedMode: bool = False
+    self._fleet: str = None
 
-  def setComputeType(self, compType: str):
-    self._compType = compType
+  def setComputeType(self, compType: Union[CBComputeType, str]):
+    self._compType = str(compType)
     return self
   
-  def setImage(self, image: str):
-    self._image = image
+  def setImage(self, image: Union[CBImage, str]):
+    self._image = str(image)
     return self
 
-  def setType(self, type: str):
-    self._type = type
+  def setType(self, type: Union[CBEnvironmentType, str]):
+    self._type = str(type)
+    return self
+
+  def setFleet(self, fleet: Union[Fleet, str]):
+    self._fleet = GetAtt(fleet, "Arn") if isinstance(fleet, Fleet) else fleet
     return self
 
   def addEnvVars(self, envVars: dict):
@@ -88,14 +173,74 @@ class CodeBuildEnvBuilder:
     self._privilegedMode = priv
     return self
 
+  def _validate(self):
+    compType = CBComputeType.fromString(self._compType)
+    envType = CBEnvironmentType.fromString(self._type)
+    if compType is not None and envType is not None \
+        and compType not in envType.computeTypes():
+      raise ValueError("Compute type " + self._compType
+                       + " is not supported by environment type " + self._type)
+    if compType is not None and compType.isLambda():
+      if self._privilegedMode:
+        raise ValueError("Lambda compute does not support privileged mode")
+      if self._fleet is not None:
+        raise ValueError("Lambda compute can not run on a reserved capacity fleet")
+
   def build(self) -> Environment:
+    checkForNoneValues(self, optional = ["_fleet"])
+    self._validate()
+    env = Environment( ComputeType = self._compType
+                     , Image = self._image
+                     , Type = self._type
+                     , EnvironmentVariables = self._envVars
+                     , PrivilegedMode = self._privilegedMode
+                     )
+    if self._fleet is not None:
+      env.Fleet = ProjectFleet( FleetArn = self._fleet )
+    return env
+
+class CodeBuildFleetBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._baseCapacity: int = 1
+    self._compType: CBComputeType = None
+    self._envType: CBEnvironmentType = None
+    self._overflow: CBFleetOverflowBehavior = CBFleetOverflowBehavior.Queue
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def setBaseCapacity(self, capacity: int):
+    if capacity < 1:
+      raise ValueError("Fleet base capacity must be at least 1")
+    self._baseCapacity = capacity
+    return self
+
+  def setComputeType(self, compType: CBComputeType):
+    self._compType = compType
+    return self
+
+  def setEnvironmentType(self, envType: CBEnvironmentType):
+    self._envType = envType
+    return self
+
+  def setOverflowBehavior(self, overflow: CBFleetOverflowBehavior):
+    self._overflow = overflow
+    return self
+
+  def build(self) -> Fleet:
     checkForNoneValues(self)
-    return Environment( ComputeType = self._compType
-                      , Image = self._image
-                      , Type = self._type
-                      , EnvironmentVariables = self._envVars
-                      , PrivilegedMode = self._privilegedMode
-                      )
+    if self._compType.isLambda() or self._compType not in self._envType.computeTypes():
+      raise ValueError("Compute type " + str(self._compType)
+                       + " can not be used for a " + str(self._envType) + " fleet")
+    return Fleet( self._name
+                , Name = Sub(self._name + "-${AWS::StackName}")
+                , BaseCapacity = self._baseCapacity
+                , ComputeType = str(self._compType)
+                , EnvironmentType = str(self._envType)
+                , OverflowBehavior = str(self._overflow)
+                )
 
 class CodeBuildSourceBuilder:
   def __init__(self):
@@ -129,6 +274,305 @@ class CodeBuildArtifactsBuilder:
     return Artifacts( Type = self._type )
 
 
+class CodeBuildBatchConfigBuilder:
+  def __init__(self):
+    self._serviceRole: str = None
+    self._computeTypes: List[str] = []
+    self._maxBuilds: int = 100
+    self._timeout: int = 480
+    self._combineArtifacts: bool = False
+    self._reportMode: CBBatchReportMode = CBBatchReportMode.AggregatedBatch
+
+  def setServiceRole(self, serviceRole: str):
+    self._serviceRole = serviceRole
+    return self
+
+  def addAllowedComputeType(self, compType: str):
+    self._computeTypes.append(str(compType))
+    return self
+
+  def setMaximumBuilds(self, maxBuilds: int):
+    if not 1 <= maxBuilds <= 100:
+      raise ValueError("Maximum builds per batch must be between 1 and 100")
+    self._maxBuilds = maxBuilds
+    return self
+
+  def setTimeout(self, minutes: int):
+    if not 5 <= minutes <= 2160:
+      raise ValueError("Batch timeout must be between 5 and 2160 minutes")
+    self._timeout = minutes
+    return self
+
+  def setCombineArtifacts(self, combine: bool):
+    self._combineArtifacts = combine
+    return self
+
+  def setReportMode(self, mode: CBBatchReportMode):
+    self._reportMode = mode
+    return self
+
+  def build(self) -> ProjectBuildBatchConfig:
+    checkForNoneValues(self)
+    restrictions = BatchRestrictions( MaximumBuildsAllowed = self._maxBuilds )
+    if self._computeTypes:
+      restrictions.ComputeTypesAllowed = self._computeTypes
+    return ProjectBuildBatchConfig( ServiceRole = self._serviceRole
+                                  , Restrictions = restrictions
+                                  , TimeoutInMins = self._timeout
+                                  , CombineArtifacts = self._combineArtifacts
+                                  , BatchReportMode = str(self._reportMode)
+                                  )
+
+
+class CodeBuildBatchEntryBuilder:
+  def __init__(self):
+    self._identifier: str = None
+    self._buildSpec: str = None
+    self._compType: str = None
+    self._image: str = None
+    self._type: str = None
+    self._envVars: dict = {}
+    self._ignoreFailure: bool = False
+    self._dependsOn: List[str] = []
+
+  def setIdentifier(self, identifier: str):
+    if not re.fullmatch(r"[A-Za-z0-9_]+", identifier):
+      raise ValueError("Batch identifiers may only contain letters, digits "
+                       "and underscores: " + identifier)
+    self._identifier = identifier
+    return self
+
+  def setBuildSpec(self, buildSpec: str):
+    self._buildSpec = buildSpec
+    return self
+
+  def setComputeType(self, compType: str):
+    self._compType = str(compType)
+    return self
+
+  def setImage(self, image: str):
+    self._image = str(image)
+    return self
+
+  def setType(self, type: str):
+    self._type = str(type)
+    return self
+
+  def addEnvVar(self, name: str, value: str):
+    self._envVars[name] = value
+    return self
+
+  def setIgnoreFailure(self, ignore: bool):
+    self._ignoreFailure = ignore
+    return self
+
+  def addDependency(self, identifier: str):
+    self._dependsOn.append(identifier)
+    return self
+
+  def build(self) -> dict:
+    checkForNoneValues( self
+                      , optional = ["_buildSpec", "_compType", "_image", "_type"]
+                      )
+    entry = { "identifier": self._identifier }
+    if self._buildSpec is not None:
+      entry["buildspec"] = self._buildSpec
+    env = {}
+    for key, value in ( ("compute-type", self._compType)
+                      , ("image", self._image)
+                      , ("type", self._type) ):
+      if value is not None:
+        env[key] = value
+    if self._envVars:
+      env["variables"] = dict(self._envVars)
+    if env:
+      entry["env"] = env
+    if self._dependsOn:
+      entry["depend-on"] = list(self._dependsOn)
+    if self._ignoreFailure:
+      entry["ignore-failure"] = True
+    return entry
+
+
+class CodeBuildBatchMatrixBuilder:
+  def __init__(self):
+    self._buildSpecs: List[str] = []
+    self._computeTypes: List[str] = []
+    self._images: List[str] = []
+    self._variables: dict = {}
+    self._ignoreFailure: bool = False
+
+  def addBuildSpec(self, buildSpec: str):
+    self._buildSpecs.append(buildSpec)
+    return self
+
+  def addComputeType(self, compType: str):
+    self._computeTypes.append(str(compType))
+    return self
+
+  def addImage(self, image: str):
+    self._images.append(str(image))
+    return self
+
+  def addVariable(self, name: str, values: List[str]):
+    self._variables[name] = list(values)
+    return self
+
+  def setIgnoreFailure(self, ignore: bool):
+    self._ignoreFailure = ignore
+    return self
+
+  def buildCount(self) -> int:
+    count = 1
+    for xs in [self._buildSpecs, self._computeTypes, self._images] \
+              + list(self._variables.values()):
+      count *= max(len(xs), 1)
+    return count
+
+  def build(self) -> dict:
+    checkForNoneValues(self)
+    dynamic = {}
+    if self._buildSpecs:
+      dynamic["buildspec"] = list(self._buildSpecs)
+    env = {}
+    if self._computeTypes:
+      env["compute-type"] = list(self._computeTypes)
+    if self._images:
+      env["image"] = list(self._images)
+    if self._variables:
+      env["variables"] = dict(self._variables)
+    if env:
+      dynamic["env"] = env
+    if not dynamic:
+      raise ValueError("A build matrix needs at least one dimension")
+    return { "static": { "ignore-failure": self._ignoreFailure }
+           , "dynamic": dynamic
+           }
+
+
+def _toYaml(value, indent: int = 0) -> str:
+  pad = "  " * indent
+  if isinstance(value, dict):
+    lines = []
+    for key, item in value.items():
+      if isinstance(item, (dict, list)) and item:
+        lines.append(pad + key + ":\n" + _toYaml(item, indent + 1))
+      else:
+        lines.append(pad + key + ": " + json.dumps(item))
+    return "\n".join(lines)
+  lines = []
+  for item in value:
+    if isinstance(item, dict) and item:
+      nested = _toYaml(item, indent + 1)
+      lines.append(pad + "- " + nested[len(pad) + 2:])
+    else:
+      lines.append(pad + "- " + json.dumps(item))
+  return "\n".join(lines)
+
+
+class CodeBuildBatchSpecBuilder:
+  def __init__(self):
+    self._fastFail: bool = True
+    self._buildList: List[dict] = []
+    self._buildGraph: List[dict] = []
+    self._buildMatrix: CodeBuildBatchMatrixBuilder = None
+
+  def setFastFail(self, fastFail: bool):
+    self._fastFail = fastFail
+    return self
+
+  def addBuildListEntry(self, entry: dict):
+    self._buildList.append(entry)
+    return self
+
+  def addBuildGraphEntry(self, entry: dict):
+    self._buildGraph.append(entry)
+    return self
+
+  def setBuildMatrix(self, matrix: CodeBuildBatchMatrixBuilder):
+    self._buildMatrix = matrix
+    return self
+
+  def _validateGraph(self):
+    ids = [ e["identifier"] for e in self._buildGraph ]
+    deps = { e["identifier"]: e.get("depend-on", []) for e in self._buildGraph }
+    for ident, ds in deps.items():
+      unknown = [ d for d in ds if d not in deps ]
+      if unknown:
+        raise ValueError("Build " + ident + " depends on unknown builds: "
+                         + str(unknown))
+    # iterative depth first search, GREY nodes on the stack mark a cycle
+    WHITE, GREY, BLACK = 0, 1, 2
+    state = { ident: WHITE for ident in ids }
+    for root in ids:
+      if state[root] != WHITE:
+        continue
+      stack = [ (root, iter(deps[root])) ]
+      state[root] = GREY
+      while stack:
+        node, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+          state[node] = BLACK
+          stack.pop()
+        elif state[child] == GREY:
+          path = [ n for n, _ in stack ]
+          cycle = path[path.index(child):] + [child]
+          raise ValueError("Build graph contains a cycle: " + " -> ".join(cycle))
+        elif state[child] == WHITE:
+          state[child] = GREY
+          stack.append((child, iter(deps[child])))
+
+  def buildCount(self) -> int:
+    if self._buildMatrix is not None:
+      return self._buildMatrix.buildCount()
+    return len(self._buildList) + len(self._buildGraph)
+
+  def validateAgainst(self, batchConfig: ProjectBuildBatchConfig):
+    restrictions = batchConfig.Restrictions
+    maxBuilds = restrictions.properties.get("MaximumBuildsAllowed")
+    if maxBuilds is not None and self.buildCount() > maxBuilds:
+      raise ValueError("Batch defines " + str(self.buildCount())
+                       + " builds, the project allows " + str(maxBuilds))
+    allowed = restrictions.properties.get("ComputeTypesAllowed")
+    if allowed:
+      used = set(e.get("env", {}).get("compute-type")
+                 for e in self._buildList + self._buildGraph)
+      if self._buildMatrix is not None:
+        used.update(self._buildMatrix._computeTypes)
+      disallowed = sorted(c for c in used if c is not None and c not in allowed)
+      if disallowed:
+        raise ValueError("Compute types not allowed by the batch config: "
+                         + str(disallowed))
+    return self
+
+  def buildDict(self) -> dict:
+    kinds = [ k for k in (self._buildList, self._buildGraph, self._buildMatrix) if k ]
+    if len(kinds) != 1:
+      raise ValueError("Exactly one of build-list, build-graph or build-matrix "
+                       "must be defined")
+    batch = { "fast-fail": self._fastFail }
+    if self._buildList:
+      entries = [ e["identifier"] for e in self._buildList ]
+      if any("depend-on" in e for e in self._buildList):
+        raise ValueError("Dependencies are only supported in a build-graph")
+      if len(entries) != len(set(entries)):
+        raise ValueError("Duplicate batch identifiers: " + str(entries))
+      batch["build-list"] = self._buildList
+    elif self._buildGraph:
+      entries = [ e["identifier"] for e in self._buildGraph ]
+      if len(entries) != len(set(entries)):
+        raise ValueError("Duplicate batch identifiers: " + str(entries))
+      self._validateGraph()
+      batch["build-graph"] = self._buildGraph
+    else:
+      batch["build-matrix"] = self._buildMatrix.build()
+    return { "batch": batch }
+
+  def build(self) -> str:
+    return _toYaml(self.buildDict())
+
+
 # examples
 def exampleCodeSpec():
   return "version: 0.2\n" \
@@ -146,9 +590,9 @@ def getExample() -> str:
   name = "ExampleElmAppBuilder"
 
   env = CodeBuildEnvBuilder() \
-      .setComputeType("BUILD_GENERAL1_SMALL") \
+      .setComputeType(CBComputeType.Small) \
       .setImage("emmanuelrosa/elm-base") \
-      .setType("LINUX_CONTAINER") \
+      .setType(CBEnvironmentType.LinuxContainer) \
       .addEnvVars( { "Name": "APP_NAME", "Value": name } ) \
       .build()
 
@@ -0,0 +1,237 @@
+from troposphere import Template
+
+from .helpers import templateToDict
+
+from typing import Dict, List, NamedTuple, Set, Tuple, Union
+import copy
+import re
+
+
+# rough creation times in seconds, override with setCreationTime
+DEFAULT_CREATION_TIMES = {
+    "AWS::IAM::Role": 20
+  , "AWS::IAM::Policy": 10
+  , "AWS::IAM::InstanceProfile": 120
+  , "AWS::S3::Bucket": 25
+  , "AWS::S3::BucketPolicy": 5
+  , "AWS::Lambda::Function": 10
+  , "AWS::Lambda::LayerVersion": 10
+  , "AWS::Lambda::Permission": 5
+  , "AWS::Lambda::EventSourceMapping": 60
+  , "AWS::CodeBuild::Project": 5
+  , "AWS::CodeBuild::Fleet": 300
+  , "AWS::CodePipeline::Pipeline": 5
+  , "AWS::Events::Rule": 60
+  , "AWS::CloudFront::Distribution": 300
+  , "AWS::CloudFront::OriginAccessControl": 5
+  , "AWS::CloudFront::CachePolicy": 5
+  , "AWS::CloudFront::OriginRequestPolicy": 5
+  , "AWS::CloudWatch::Alarm": 5
+  , "AWS::CloudWatch::Dashboard": 5
+  }
+DEFAULT_CREATION_TIME = 10
+
+_SUB_VARIABLE = re.compile(r"\$\{([^!][^}.]*)(?:\.[^}]*)?\}")
+
+
+class Edge(NamedTuple):
+  source: str
+  target: str
+  explicit: bool
+
+
+class Suggestion(NamedTuple):
+  edge: Edge
+  savedSeconds: float
+  message: str
+
+
+def _references(value, found: Set[str]):
+  if isinstance(value, dict):
+    for key, item in value.items():
+      if key == "Ref" and isinstance(item, str):
+        found.add(item)
+      elif key == "Fn::GetAtt":
+        found.add(item[0] if isinstance(item, list) else item.split(".")[0])
+      elif key == "Fn::Sub":
+        text, variables = (item[0], item[1]) if isinstance(item, list) else (item, {})
+        found.update(v for v in _SUB_VARIABLE.findall(text) if v not in variables)
+        _references(variables, found)
+      else:
+        _references(item, found)
+  elif isinstance(value, list):
+    for item in value:
+      _references(item, found)
+
+
+class DependencyGraph:
+  def __init__(self, template: Union[Template, dict, str]):
+    self._template = templateToDict(template)
+    self._resources: dict = self._template.get("Resources", {})
+    self._times: dict = dict(DEFAULT_CREATION_TIMES)
+    # source -> target -> True when the edge only exists through DependsOn
+    self._edges: Dict[str, Dict[str, bool]] = {}
+    # DependsOn entries that repeat a Ref/GetAtt/Sub of the same resource
+    self._duplicates: Set[Tuple[str, str]] = set()
+    for name, resource in self._resources.items():
+      targets = {}
+      found = set()
+      _references(resource.get("Properties", {}), found)
+      for target in found:
+        if target in self._resources and target != name:
+          targets[target] = False
+      dependsOn = resource.get("DependsOn", [])
+      for target in [dependsOn] if isinstance(dependsOn, str) else dependsOn:
+        if target not in self._resources:
+          raise ValueError(name + " depends on unknown resource " + target)
+        if target in targets and not targets[target]:
+          self._duplicates.add((name, target))
+        targets.setdefault(target, True)
+      self._edges[name] = targets
+    self._order = self._topologicalOrder()
+
+  def setCreationTime(self, resourceType: str, seconds: float):
+    self._times[resourceType] = seconds
+    return self
+
+  def weight(self, name: str) -> float:
+    return self._times.get(self._resources[name].get("Type"), DEFAULT_CREATION_TIME)
+
+  def edges(self) -> List[Edge]:
+    return [ Edge(s, t, explicit) for s, ts in self._edges.items()
+             for t, explicit in ts.items() ]
+
+  # dependencies first; raises on cycles like CloudFormation does
+  def _topologicalOrder(self) -> List[str]:
+    remaining = { n: len(ts) for n, ts in self._edges.items() }
+    dependents: Dict[str, List[str]] = { n: [] for n in self._edges }
+    for source, targets in self._edges.items():
+      for target in targets:
+        dependents[target].append(source)
+    ready = sorted(n for n, count in remaining.items() if count == 0)
+    order = []
+    while ready:
+      node = ready.pop()
+      order.append(node)
+      for dependent in dependents[node]:
+        remaining[dependent] -= 1
+        if remaining[dependent] == 0:
+          ready.append(dependent)
+    if len(order) != len(self._edges):
+      cyclic = sorted(n for n, count in remaining.items() if count > 0)
+      raise ValueError("Circular dependency between resources: " + str(cyclic))
+    return order
+
+  def _finishTimes(self, skip: Edge = None) -> Tuple[Dict[str, float], Dict[str, str]]:
+    finish, via = {}, {}
+    for node in self._order:
+      start, previous = 0.0, None
+      for target in self._edges[node]:
+        if skip is not None and (node, target) == (skip.source, skip.target):
+          continue
+        if finish[target] > start:
+          start, previous = finish[target], target
+      finish[node] = start + self.weight(node)
+      via[node] = previous
+    return finish, via
+
+  def criticalPath(self) -> Tuple[float, List[str]]:
+    if not self._order:
+      return 0.0, []
+    finish, via = self._finishTimes()
+    node = max(self._order, key = lambda n: finish[n])
+    length = finish[node]
+    path = []
+    while node is not None:
+      path.append(node)
+      node = via[node]
+    return length, list(reversed(path))
+
+  def depth(self) -> int:
+    levels = {}
+    for node in self._order:
+      levels[node] = 1 + max((levels[t] for t in self._edges[node]), default = 0)
+    return max(levels.values(), default = 0)
+
+  # DependsOn edges whose target is already reached through another path
+  def redundantDependsOn(self) -> List[Edge]:
+    reach: Dict[str, int] = {}
+    bit = { n: 1 << i for i, n in enumerate(self._order) }
+    for node in self._order:
+      mask = 0
+      for target in self._edges[node]:
+        mask |= reach[target] | bit[target]
+      reach[node] = mask
+    redundant = []
+    for source, targets in self._edges.items():
+      for target, explicit in targets.items():
+        if not explicit:
+          if (source, target) in self._duplicates:
+            redundant.append(Edge(source, target, True))
+          continue
+        others = 0
+        for other in targets:
+          if other != target:
+            others |= reach[other] | bit[other]
+        if others & bit[target]:
+          redundant.append(Edge(source, target, True))
+    return redundant
+
+  def suggestions(self) -> List[Suggestion]:
+    length, path = self.criticalPath()
+    redundant = set((e.source, e.target) for e in self.redundantDependsOn())
+    result = [ Suggestion( Edge(s, t, True), 0.0
+                         , "remove DependsOn %s -> %s, it is implied by other references" % (s, t))
+               for s, t in sorted(redundant) ]
+    for target, source in zip(path, path[1:]):
+      edge = Edge(source, target, self._edges[source][target])
+      finish, _ = self._finishTimes(skip = edge)
+      saved = length - max(finish.values())
+      if saved <= 0 or (source, target) in redundant:
+        continue
+      if edge.explicit:
+        message = ("DependsOn %s -> %s is on the critical path, removing it saves %.0fs"
+                   % (source, target, saved))
+      else:
+        message = ("%s references %s on the critical path (%.0fs); pass a known value "
+                   "such as a parameter or a resource in another stack instead"
+                   % (source, target, saved))
+      result.append(Suggestion(edge, saved, message))
+    return sorted(result, key = lambda s: -s.savedSeconds)
+
+  # returns a copy of the template without the given (default: redundant)
+  # DependsOn edges; references are never rewritten
+  def apply(self, edges: List[Edge] = None) -> dict:
+    edges = self.redundantDependsOn() if edges is None else edges
+    template = copy.deepcopy(self._template)
+    resources = template.get("Resources", {})
+    for edge in edges:
+      if not edge.explicit:
+        raise ValueError("Only DependsOn edges can be removed: %s -> %s"
+                         % (edge.source, edge.target))
+      resource = resources[edge.source]
+      dependsOn = resource.get("DependsOn", [])
+      dependsOn = [dependsOn] if isinstance(dependsOn, str) else dependsOn
+      dependsOn = [ d for d in dependsOn if d != edge.target ]
+      if dependsOn:
+        resource["DependsOn"] = dependsOn
+      else:
+        resource.pop("DependsOn", None)
+    return template
+
+  def toDot(self) -> str:
+    _, path = self.criticalPath()
+    critical = set(zip(path[1:], path))
+    lines = [ "digraph template {", "  rankdir=BT;" ]
+    for node in self._order:
+      color = ", color=red" if node in path else ""
+      lines.append('  "%s" [label="%s\\n%s (%ss)"%s];'
+                   % (node, node, self._resources[node].get("Type"), self.weight(node), color))
+    for edge in self.edges():
+      style = [ "style=dashed" ] if edge.explicit else []
+      if (edge.source, edge.target) in critical:
+        style.append("color=red")
+      lines.append('  "%s" -> "%s"%s;' % ( edge.source, edge.target
+                                         , " [" + ", ".join(style) + "]" if style else ""))
+    lines.append("}")
+    return "\n".join(lines)
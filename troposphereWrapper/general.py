@@ -1,11 +1,24 @@
 from troposphere import Parameter, Template
 from .helpers import checkForNoneValues
 
+from typing import Dict, List
+import json
+import re
+
 class ParameterBuilder:
   def __init__(self):
     self._name: str = None
     self._description: str = None
     self._type: str = None
+    self._default = None
+    self._allowedValues: list = None
+    self._allowedPattern: str = None
+    self._minLength: int = None
+    self._maxLength: int = None
+    self._minValue = None
+    self._maxValue = None
+    self._noEcho: bool = None
+    self._constraintDescription: str = None
 
   def setName(self, name: str):
     self._name = name
@@ -18,14 +31,164 @@ class ParameterBuilder:
   def setType(self, type: str):
     self._type = type
     return self
-  
-  def build(self) -> Parameter:
-    checkForNoneValues(self)
-    return Parameter(
+
+  def setDefault(self, default):
+    self._default = default
+    return self
+
+  def addAllowedValue(self, value):
+    if self._allowedValues is None:
+      self._allowedValues = []
+    self._allowedValues.append(value)
+    return self
+
+  def setAllowedPattern(self, pattern: str):
+    re.compile(pattern)
+    self._allowedPattern = pattern
+    return self
+
+  def setLength(self, minLength: int = None, maxLength: int = None):
+    self._minLength = minLength
+    self._maxLength = maxLength
+    return self
+
+  def setValueRange(self, minValue = None, maxValue = None):
+    self._minValue = minValue
+    self._maxValue = maxValue
+    return self
+
+  def setNoEcho(self, noEcho: bool):
+    self._noEcho = noEcho
+    return self
+
+  def setConstraintDescription(self, description: str):
+    self._constraintDescription = description
+    return self
+
+  def _validate(self):
+    isNumber = self._type in ("Number", "List<Number>")
+    if isNumber and (self._minLength is not None or self._maxLength is not None
+                     or self._allowedPattern is not None):
+      raise ValueError("Length and pattern constraints require a String parameter: "
+                       + self._name)
+    if not isNumber and (self._minValue is not None or self._maxValue is not None):
+      raise ValueError("Value constraints require a Number parameter: " + self._name)
+    if self._default is not None:
+      errors = compileParameter(self.build(validate = False))(str(self._default))
+      if errors:
+        raise ValueError("Default of " + self._name + " violates its constraints: "
+                         + "; ".join(errors))
+
+  def build(self, validate: bool = True) -> Parameter:
+    optional = [ "_default", "_allowedValues", "_allowedPattern", "_minLength"
+               , "_maxLength", "_minValue", "_maxValue", "_noEcho"
+               , "_constraintDescription" ]
+    checkForNoneValues(self, optional = optional)
+    if validate:
+      self._validate()
+    parameter = Parameter(
         self._name
       , Description = self._description
       , Type = self._type
       )
+    for attr in optional:
+      value = getattr(self, attr)
+      if value is not None:
+        setattr(parameter, attr[1].upper() + attr[2:], value)
+    return parameter
+
+
+def _checkScalar(p: dict, number: bool):
+  allowed = frozenset(str(v) for v in p["AllowedValues"]) if "AllowedValues" in p else None
+  pattern = re.compile(p["AllowedPattern"]) if "AllowedPattern" in p else None
+  minLength = p.get("MinLength")
+  maxLength = p.get("MaxLength")
+  minValue = float(p["MinValue"]) if "MinValue" in p else None
+  maxValue = float(p["MaxValue"]) if "MaxValue" in p else None
+
+  def check(value: str) -> List[str]:
+    errors = []
+    if allowed is not None and value not in allowed:
+      errors.append("value %r is not one of %s" % (value, sorted(allowed)))
+    if number:
+      try:
+        n = float(value)
+      except ValueError:
+        return errors + [ "value %r is not a number" % value ]
+      if minValue is not None and n < minValue:
+        errors.append("value %s is below MinValue %s" % (value, p["MinValue"]))
+      if maxValue is not None and n > maxValue:
+        errors.append("value %s is above MaxValue %s" % (value, p["MaxValue"]))
+    else:
+      if pattern is not None and pattern.fullmatch(value) is None:
+        errors.append("value %r does not match AllowedPattern %s"
+                      % (value, p["AllowedPattern"]))
+      if minLength is not None and len(value) < int(minLength):
+        errors.append("value %r is shorter than MinLength %s" % (value, minLength))
+      if maxLength is not None and len(value) > int(maxLength):
+        errors.append("value %r is longer than MaxLength %s" % (value, maxLength))
+    return errors
+  return check
+
+
+# compiles the constraints of one parameter into a function returning the
+# violations of a value
+def compileParameter(parameter: Parameter):
+  p = parameter.to_dict()
+  paramType = p["Type"]
+  if paramType == "CommaDelimitedList" or paramType.startswith("List<"):
+    item = _checkScalar(p, paramType == "List<Number>")
+    return lambda value: [ e for v in value.split(",") for e in item(v.strip()) ]
+  return _checkScalar(p, paramType == "Number")
+
+
+class ParameterValidator:
+  def __init__(self, parameters: List[Parameter]):
+    self._checks: Dict[str, object] = {}
+    self._required = []
+    for parameter in parameters:
+      self._checks[parameter.title] = compileParameter(parameter)
+      if "Default" not in parameter.properties:
+        self._required.append(parameter.title)
+
+  @classmethod
+  def fromTemplate(cls, template: Template):
+    return cls(list(template.parameters.values()))
+
+  def validate(self, values: Dict[str, str]) -> List[str]:
+    errors = [ name + ": missing value" for name in self._required
+               if name not in values ]
+    for name, value in values.items():
+      check = self._checks.get(name)
+      if check is None:
+        errors.append(name + ": not a parameter of the template")
+      else:
+        errors.extend(name + ": " + e for e in check(str(value)))
+    return errors
+
+  # accepts {"Name": "value"} files as well as the
+  # [{"ParameterKey": ..., "ParameterValue": ...}] format of the aws cli
+  def validateFile(self, path: str) -> List[str]:
+    try:
+      with open(path) as f:
+        values = json.load(f)
+    except (OSError, ValueError) as e:
+      return [ "unreadable parameter file: " + str(e) ]
+    try:
+      if isinstance(values, list):
+        values = { v["ParameterKey"]: v["ParameterValue"] for v in values }
+      return self.validate(dict(values))
+    except (KeyError, TypeError, ValueError) as e:
+      return [ "malformed parameter file: " + str(e) ]
+
+  def validateFiles(self, paths: List[str]) -> Dict[str, List[str]]:
+    report = {}
+    for path in paths:
+      errors = self.validateFile(path)
+      if errors:
+        report[path] = errors
+    return report
+
 
 def getExample() -> str:
   template = Template()
@@ -36,4 +199,14 @@ def getExample() -> str:
       .setType("String") \
       .build()
     )
+  template.add_parameter(
+    ParameterBuilder() \
+      .setName("Environment") \
+      .setDescription("Deployment environment") \
+      .setType("String") \
+      .addAllowedValue("dev") \
+      .addAllowedValue("prod") \
+      .setDefault("dev") \
+      .build()
+    )
   return template.to_json()
@@ -1,5 +1,18 @@
-def checkForNoneValues(obj):
-  if any(value is None for attr, value in vars(obj).items()):
-      xs = filter(lambda x: x[1] == None, vars(obj).items())
+from troposphere import Template
+
+import json
+
+def checkForNoneValues(obj, optional = ()):
+  if any(value is None for attr, value in vars(obj).items() if attr not in optional):
+      xs = filter(lambda x: x[1] == None and x[0] not in optional, vars(obj).items())
       xs = list(map(lambda x: x[0], xs))
-      raise ValueError("Values which are None: "+ str(xs))
\ No newline at end of file
+      raise ValueError("Values which are None: "+ str(xs))
+
+
+# rendered template as a dict from a Template, JSON text or dict
+def templateToDict(template) -> dict:
+  if isinstance(template, Template):
+    return template.to_dict()
+  if isinstance(template, str):
+    return json.loads(template)
+  return template
@@ -76,6 +76,7 @@ class StatementBuilder:
     self._actions: List[ awacs.aws.Action] = []
     self._effect: Effects = None
     self._resource: List[str] = None
+    self._condition: awacs.aws.Condition = None
 
   def addResource(self, res: str):
     if self._resource is None:
@@ -95,26 +96,33 @@ class StatementBuilder:
     self._effect = effect
     return self
 
+  def setCondition(self, condition: awacs.aws.Condition):
+    self._condition = condition
+    return self
+
   def build(self) -> awacs.aws.Statement:
     if self._principal is not None and self._resource is None:
-      return awacs.aws.Statement(
+      statement = awacs.aws.Statement(
           Principal = self._principal
         , Action = self._actions
         , Effect = self._effect.get()
         )
     elif self._resource is not None and self._principal is None:
-      return awacs.aws.Statement(
+      statement = awacs.aws.Statement(
           Action = self._actions
         , Effect = self._effect.get()
         , Resource = self._resource
         )
     else:
-       return awacs.aws.Statement(
+      statement = awacs.aws.Statement(
           Action = self._actions
         , Effect = self._effect.get()
         , Resource = self._resource
         , Principal = self._principal
         )
+    if self._condition is not None:
+      statement.Condition = self._condition
+    return statement
 
 
 
@@ -176,6 +184,25 @@ class RoleBuilderHelper:
         .build()
     return self.bucketPolicy(bucket, policy)
 
+  def cloudFrontReadForS3Buckets(self, bucket, distribution):
+    distributionArn = Join("", [ "arn:aws:cloudfront::"
+                               , Ref("AWS::AccountId")
+                               , ":distribution/"
+                               , Ref(distribution)
+                               ])
+    policy = PolicyDocumentBuilder() \
+      .addStatement( StatementBuilder() \
+          .addResource(Join("", [ "arn:aws:s3:::", Ref(bucket), "/*"])) \
+          .setEffect(Effects.Allow) \
+          .setPrincipal(awacs.aws.Principal("Service", "cloudfront.amazonaws.com")) \
+          .addAction(awacs.s3.GetObject) \
+          .setCondition(awacs.aws.Condition(
+              awacs.aws.StringEquals("AWS:SourceArn", distributionArn))) \
+          .build()
+        ) \
+        .build()
+    return self.bucketPolicy(bucket, policy)
+
   def oneClickCreateLogsPolicy(self) -> awacs.aws.Policy:
     return PolicyBuilder() \
       .setName("OneClickCreateLogsPolicy") \
@@ -218,6 +245,23 @@ class RoleBuilderHelper:
         ) \
         .build()
 
+  def startPipelineExecutionPolicy(self, pipeline) -> Policy:
+    pipelineArn = Join("", [ "arn:aws:codepipeline:"
+                           , Ref("AWS::Region"), ":"
+                           , Ref("AWS::AccountId"), ":"
+                           , Ref(pipeline)
+                           ])
+    return PolicyBuilder() \
+      .setName(pipeline.title + "StartPipelineExecution") \
+      .addStatement(
+        StatementBuilder() \
+          .setEffect(Effects.Allow) \
+          .addAction(awacs.codepipeline.StartPipelineExecution) \
+          .addResource(pipelineArn) \
+          .build()
+        ) \
+        .build()
+
   def defaultAssumeRolePolicyDocument(self, service: str) -> awacs.aws.Policy:
     return PolicyDocumentBuilder() \
       .addStatement(
@@ -0,0 +1,113 @@
+from .persistent import PersistentMap, PersistentVector, EMPTY_MAP, EMPTY_VECTOR
+
+import copy
+
+
+SETTER_PREFIXES = ("set", "add", "enable")
+_ASSIGNED = "_immutableAssigned"
+_recorders: dict = {}
+
+
+# subclass of a builder that remembers which attributes were assigned, so a
+# setter restoring a constructor default is recorded like any other value
+def _recorder(builderClass):
+  recorder = _recorders.get(builderClass)
+  if recorder is None:
+    def __setattr__(self, name, value):
+      object.__setattr__(self, name, value)
+      self.__dict__.setdefault(_ASSIGNED, set()).add(name)
+    recorder = type(builderClass.__name__, (builderClass,), { "__setattr__": __setattr__ })
+    _recorders[builderClass] = recorder
+  return recorder
+
+
+def _materialize(value):
+  if isinstance(value, PersistentVector):
+    return value.toList()
+  if isinstance(value, PersistentMap):
+    return value.toDict()
+  return value
+
+
+# immutable variant of any builder in this package: set*/add*/enable* return
+# a new Immutable sharing unchanged state with the original, so forking a base
+# configuration is O(1) and instances are safe to share between threads
+#
+#   base = Immutable(LambdaBuilder).setRuntime(LambdaRuntime.Python3x)
+#   functions = [ base.setName("Fn%d" % i).build() for i in range(200) ]
+#
+# each setter runs on a materialized builder and only the attributes it
+# changed are recorded, so the builders' own setter logic and checks are
+# reused; any other method runs on a fully materialized builder
+class Immutable:
+  __slots__ = ("_builderClass", "_state")
+
+  def __init__(self, builderClass, _state: PersistentMap = EMPTY_MAP):
+    object.__setattr__(self, "_builderClass", builderClass)
+    object.__setattr__(self, "_state", _state)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("Immutable builders can not be modified")
+
+  # stores a container changed by a setter; appended items and changed keys
+  # extend the shared persistent value, anything else replaces it
+  def _record(self, state: PersistentMap, attr: str, value, contents) -> PersistentMap:
+    current = state.get(attr)
+    if isinstance(value, list):
+      kept = contents is not None and len(value) >= len(contents) \
+             and all(a is b for a, b in zip(value, contents))
+      if kept and len(value) == len(contents):
+        return state
+      if kept and isinstance(current, PersistentVector):
+        return state.set(attr, current.extend(value[len(contents):]))
+      return state.set(attr, EMPTY_VECTOR.extend(value))
+    kept = contents is not None and all(k in value for k in contents)
+    changed = { k: v for k, v in value.items()
+                if not kept or k not in contents or contents[k] is not v }
+    if kept and not changed:
+      return state
+    if kept and isinstance(current, PersistentMap):
+      return state.set(attr, current.update(changed))
+    return state.set(attr, PersistentMap(value))
+
+  # runs the setter on a builder holding the current state, so setters that
+  # read or check existing values behave like on the mutable builder, and
+  # records what it changed
+  def _apply(self, method: str, args, kwargs) -> "Immutable":
+    scratch = self.materialize()
+    before = { attr: (value, copy.copy(value) if isinstance(value, (list, dict)) else None)
+               for attr, value in vars(scratch).items() }
+    scratch.__class__ = _recorder(self._builderClass)
+    result = getattr(scratch, method)(*args, **kwargs)
+    if result is not scratch:
+      raise TypeError(method + " is not a fluent setter of "
+                      + self._builderClass.__name__)
+    assigned = vars(scratch).pop(_ASSIGNED, set())
+    state = self._state
+    for attr, value in vars(scratch).items():
+      old, contents = before.get(attr, (None, None))
+      if isinstance(value, (list, dict)):
+        state = self._record(state, attr, value, contents)
+      elif attr in assigned or value is not old:
+        state = state.set(attr, value)
+    return Immutable(self._builderClass, state)
+
+  # a fresh mutable builder holding this state, changes to it do not leak back
+  def materialize(self):
+    builder = self._builderClass()
+    for attr, value in self._state.items():
+      setattr(builder, attr, _materialize(value))
+    return builder
+
+  def build(self):
+    return self.materialize().build()
+
+  def __getattr__(self, name: str):
+    if name.startswith("_") or not hasattr(self._builderClass, name):
+      raise AttributeError(name)
+    if name.startswith(SETTER_PREFIXES):
+      return lambda *args, **kwargs: self._apply(name, args, kwargs)
+    return lambda *args, **kwargs: getattr(self.materialize(), name)(*args, **kwargs)
+
+  def __repr__(self) -> str:
+    return "Immutable(" + self._builderClass.__name__ + ", " + repr(self._state) + ")"
@@ -0,0 +1,166 @@
+from troposphere import Sub
+from troposphere.awslambda import LayerVersion, Content
+
+from .awslambda import LambdaBuilder, MAX_LAYERS
+from .helpers import checkForNoneValues
+
+from typing import Dict, List, NamedTuple, Set
+import hashlib
+
+
+# unzipped size limit of a function including all of its layers
+MAX_UNZIPPED_BYTES = 250 * 1024 * 1024
+
+
+class LayerSavings(NamedTuple):
+  function: str
+  packageBytes: int
+  layeredPackageBytes: int
+  savedBytes: int
+  layers: List[str]
+
+
+class _Layer(NamedTuple):
+  runtime: str
+  requirements: tuple
+  sizeBytes: int
+  functions: tuple
+
+  def digest(self) -> str:
+    content = self.runtime + "\n" + "\n".join(self.requirements)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class LambdaLayerManager:
+  def __init__(self):
+    self._bucket = None
+    self._prefix: str = "layers/"
+    self._maxLayers: int = MAX_LAYERS
+    self._functions: List[LambdaBuilder] = []
+    self._layers: List[_Layer] = None
+    self._assignments: Dict[str, List[_Layer]] = None
+    # titles of the layers build attached, replaced on the next build
+    self._attached: Set[str] = set()
+
+  def setLayerBucket(self, bucket):
+    self._bucket = bucket
+    return self
+
+  def setKeyPrefix(self, prefix: str):
+    self._prefix = prefix
+    return self
+
+  def setMaxLayersPerFunction(self, maxLayers: int):
+    if not 1 <= maxLayers <= MAX_LAYERS:
+      raise ValueError("Layers per function must be between 1 and " + str(MAX_LAYERS))
+    self._maxLayers = maxLayers
+    return self
+
+  def addFunction(self, function: LambdaBuilder):
+    self._functions.append(function)
+    return self
+
+  # dependencies used by the same set of functions go into one layer, so no
+  # function receives a dependency it does not need
+  def _plan(self):
+    usage: Dict[tuple, List[str]] = {}
+    for f in self._functions:
+      for requirement in f._dependencies:
+        usage.setdefault((str(f._runtime), requirement), []).append(f._name)
+    sizes = { (str(f._runtime), r): size
+              for f in self._functions for r, size in f._dependencies.items() }
+    groups: Dict[tuple, List[str]] = {}
+    for (runtime, requirement), users in usage.items():
+      if len(users) > 1:
+        groups.setdefault((runtime, tuple(sorted(users))), []).append(requirement)
+    layers = [ _Layer( runtime = runtime
+                     , requirements = tuple(sorted(reqs))
+                     , sizeBytes = sum(sizes[(runtime, r)] for r in reqs)
+                     , functions = users
+                     )
+               for (runtime, users), reqs in groups.items() ]
+    # the biggest total saving wins when a function hits the layer limit
+    layers.sort(key = lambda l: (-l.sizeBytes * (len(l.functions) - 1), l.digest()))
+
+    # layers attached with LambdaBuilder.addLayer count against the limit,
+    # except the shared layers a previous build attached
+    capacity = { f._name: self._maxLayers - len(self._ownLayers(f))
+                 for f in self._functions }
+    assignments = { f._name: [] for f in self._functions }
+    for layer in layers:
+      eligible = [ n for n in layer.functions
+                   if len(assignments[n]) < capacity[n] ]
+      if len(eligible) > 1:
+        for name in eligible:
+          assignments[name].append(layer)
+    attached = set(l for ls in assignments.values() for l in ls)
+    self._layers = [ l for l in layers if l in attached ]
+    self._assignments = assignments
+
+  def _ownLayers(self, function: LambdaBuilder) -> list:
+    return [ l for l in function._layers
+             if getattr(l, "title", None) not in self._attached ]
+
+  def _title(self, layer: _Layer) -> str:
+    return "SharedLayer" + layer.digest()[:16]
+
+  def _key(self, layer: _Layer) -> str:
+    return self._prefix + layer.digest() + ".zip"
+
+  # builds the layer resources and attaches them to the functions; identical
+  # contents keep the same logical id and S3 key so they are never rebuilt,
+  # layers of a previous build are detached first
+  def build(self) -> List[LayerVersion]:
+    checkForNoneValues(self, optional = ["_layers", "_assignments"])
+    for f in self._functions:
+      if sum(f._dependencies.values()) > MAX_UNZIPPED_BYTES:
+        raise ValueError(f._name + " exceeds the unzipped size limit of "
+                         + str(MAX_UNZIPPED_BYTES) + " bytes")
+    self._plan()
+    resources = {}
+    for layer in self._layers:
+      resources[layer] = LayerVersion(
+          self._title(layer)
+        , LayerName = Sub(self._title(layer) + "-${AWS::StackName}")
+        , Description = ", ".join(layer.requirements)[:256]
+        , CompatibleRuntimes = [ layer.runtime ]
+        , Content = Content( S3Bucket = self._bucket
+                           , S3Key = self._key(layer)
+                           )
+        )
+    for f in self._functions:
+      f._layers = self._ownLayers(f)
+      for layer in self._assignments[f._name]:
+        f.addLayer(resources[layer])
+    self._attached = set(r.title for r in resources.values())
+    return list(resources.values())
+
+  # requirements of each layer archive by S3 key, build only the missing keys
+  def layerManifests(self) -> Dict[str, List[str]]:
+    if self._layers is None:
+      self._plan()
+    return { self._key(l): list(l.requirements) for l in self._layers }
+
+  # requirements that still have to be packaged with the function itself
+  def remainingDependencies(self, function: LambdaBuilder) -> List[str]:
+    if self._assignments is None:
+      self._plan()
+    layered = set(r for l in self._assignments[function._name] for r in l.requirements)
+    return sorted(r for r in function._dependencies if r not in layered)
+
+  def report(self) -> List[LayerSavings]:
+    if self._assignments is None:
+      self._plan()
+    savings = []
+    for f in self._functions:
+      layers = self._assignments[f._name]
+      layered = set(r for l in layers for r in l.requirements)
+      total = sum(f._dependencies.values())
+      remaining = sum(size for r, size in f._dependencies.items() if r not in layered)
+      savings.append(LayerSavings( function = f._name
+                                 , packageBytes = total
+                                 , layeredPackageBytes = remaining
+                                 , savedBytes = total - remaining
+                                 , layers = [ self._title(l) for l in layers ]
+                                 ))
+    return savings
@@ -0,0 +1,283 @@
+from troposphere import Template, Parameter, Ref, Sub, AWSObject, MAX_RESOURCES, MAX_PARAMETERS
+from troposphere.cloudformation import Stack
+from troposphere.cloudwatch import Alarm, Dashboard, MetricDimension
+from troposphere.events import Rule, Target
+
+from enum import Enum
+from typing import Dict, List, Union
+import json
+
+
+class AlarmMetric(Enum):
+  # (id, namespace, metric, statistic, dimension, resource type)
+  LambdaDurationP99   = (1, "AWS/Lambda", "Duration", "p99", "FunctionName", "AWS::Lambda::Function")
+  LambdaThrottles     = (2, "AWS/Lambda", "Throttles", "Sum", "FunctionName", "AWS::Lambda::Function")
+  LambdaConcurrency   = (3, "AWS/Lambda", "ConcurrentExecutions", "Maximum", "FunctionName", "AWS::Lambda::Function")
+  CodeBuildDuration   = (4, "AWS/CodeBuild", "Duration", "Maximum", "ProjectName", "AWS::CodeBuild::Project")
+  CodeBuildQueued     = (5, "AWS/CodeBuild", "QueuedDuration", "Maximum", "ProjectName", "AWS::CodeBuild::Project")
+  PipelineFailures    = (6, "AWS/Events", "TriggeredRules", "Sum", "RuleName", "AWS::CodePipeline::Pipeline")
+  def __str__(self):
+    return self.value[2]
+
+  def namespace(self) -> str:
+    return self.value[1]
+
+  def statistic(self) -> str:
+    return self.value[3]
+
+  def dimension(self) -> str:
+    return self.value[4]
+
+  def resourceType(self) -> str:
+    return self.value[5]
+
+
+METRICS_BY_TYPE: Dict[str, List[AlarmMetric]] = {}
+for _metric in AlarmMetric:
+  METRICS_BY_TYPE.setdefault(_metric.resourceType(), []).append(_metric)
+
+# fraction of the configured timeout or limit at which duration and
+# concurrency alarms fire when no explicit threshold is given
+DEFAULT_LIMIT_FRACTION = 0.8
+LAMBDA_DEFAULT_TIMEOUT = 3
+LAMBDA_ACCOUNT_CONCURRENCY = 1000
+CODEBUILD_DEFAULT_TIMEOUT = 60
+DEFAULT_THRESHOLDS = {
+    AlarmMetric.LambdaThrottles: 1
+  , AlarmMetric.CodeBuildQueued: 300
+  , AlarmMetric.PipelineFailures: 1
+  }
+MAX_METRICS_PER_WIDGET = 20
+
+
+def _intProperty(resource: AWSObject, name: str, default: int) -> int:
+  value = resource.properties.get(name)
+  return int(value) if isinstance(value, (int, str)) and str(value).isdigit() else default
+
+
+def _defaultThreshold(metric: AlarmMetric, resource: AWSObject) -> float:
+  if metric in DEFAULT_THRESHOLDS:
+    return DEFAULT_THRESHOLDS[metric]
+  if metric == AlarmMetric.LambdaDurationP99:
+    timeout = _intProperty(resource, "Timeout", LAMBDA_DEFAULT_TIMEOUT)
+    return timeout * 1000 * DEFAULT_LIMIT_FRACTION
+  if metric == AlarmMetric.LambdaConcurrency:
+    limit = _intProperty(resource, "ReservedConcurrentExecutions", LAMBDA_ACCOUNT_CONCURRENCY)
+    return max(1, int(limit * DEFAULT_LIMIT_FRACTION))
+  timeout = _intProperty(resource, "TimeoutInMinutes", CODEBUILD_DEFAULT_TIMEOUT)
+  return timeout * 60 * DEFAULT_LIMIT_FRACTION
+
+
+def _title(resource) -> str:
+  return resource.title if isinstance(resource, AWSObject) else resource
+
+
+# alarms for every Lambda function, CodeBuild project and pipeline of a
+# template plus one dashboard per stack; pipelines publish no metrics, so
+# their failures are counted by an EventBridge rule matching failed executions;
+# Lambda functions take three alarms each, so anything beyond a small stack
+# goes into separate templates (buildTemplates) instead of addToTemplate
+class MonitoringBuilder:
+  def __init__(self):
+    self._template: Template = None
+    self._alarmActions: list = []
+    self._period: int = 300
+    self._evaluationPeriods: int = 1
+    self._thresholds: Dict[tuple, float] = {}
+    self._dashboard: bool = True
+
+  def setTemplate(self, template: Template):
+    self._template = template
+    return self
+
+  def addAlarmAction(self, action: Union[AWSObject, str]):
+    self._alarmActions.append(action)
+    return self
+
+  def setPeriod(self, period: int):
+    if period not in (10, 30) and period % 60 != 0:
+      raise ValueError("Alarm period must be 10, 30 or a multiple of 60 seconds")
+    self._period = period
+    return self
+
+  def setEvaluationPeriods(self, evaluationPeriods: int):
+    self._evaluationPeriods = evaluationPeriods
+    return self
+
+  # resource is a logical id or resource, a threshold of None disables the alarm
+  def setThreshold(self, resource: Union[AWSObject, str], metric: AlarmMetric
+                  , threshold: float):
+    self._thresholds[(_title(resource), metric)] = threshold
+    return self
+
+  def disableDashboard(self):
+    self._dashboard = False
+    return self
+
+  def _actions(self) -> list:
+    return [ Ref(a) if isinstance(a, AWSObject) else a for a in self._alarmActions ]
+
+  def _failureRule(self, pipeline: AWSObject) -> Rule:
+    rule = Rule(
+        pipeline.title + "FailureRule"
+      , Description = "Failed executions of " + pipeline.title
+      , EventPattern = { "source": [ "aws.codepipeline" ]
+                       , "detail-type": [ "CodePipeline Pipeline Execution State Change" ]
+                       , "detail": { "state": [ "FAILED" ]
+                                   , "pipeline": [ Ref(pipeline) ]
+                                   }
+                       }
+      , State = "ENABLED"
+      )
+    # SNS topics used as targets need a topic policy for events.amazonaws.com
+    targets = self._actions()
+    if targets:
+      rule.Targets = [ Target(Arn = arn, Id = "Notify%d" % i)
+                       for i, arn in enumerate(targets) ]
+    return rule
+
+  def _alarm(self, resource: AWSObject, metric: AlarmMetric, threshold: float
+            , dimension) -> Alarm:
+    alarm = Alarm(
+        resource.title + metric.name + "Alarm"
+      , AlarmDescription = "%s %s of %s" % (metric.statistic(), metric, resource.title)
+      , Namespace = metric.namespace()
+      , MetricName = str(metric)
+      , Dimensions = [ MetricDimension(Name = metric.dimension(), Value = dimension) ]
+      , Period = self._period
+      , EvaluationPeriods = self._evaluationPeriods
+      , Threshold = threshold
+      , ComparisonOperator = "GreaterThanOrEqualToThreshold"
+      , TreatMissingData = "notBreaching"
+      )
+    if metric.statistic().startswith("p"):
+      alarm.ExtendedStatistic = metric.statistic()
+    else:
+      alarm.Statistic = metric.statistic()
+    actions = self._actions()
+    if actions:
+      alarm.AlarmActions = actions
+    return alarm
+
+  # widgets group up to MAX_METRICS_PER_WIDGET resources per metric; names
+  # are resolved by Fn::Sub, "${LogicalId}" is the Ref of that resource
+  def _buildDashboard(self, monitored: Dict[AlarmMetric, List[str]]) -> Dashboard:
+    widgets = []
+    for metric, dimensions in monitored.items():
+      for start in range(0, len(dimensions), MAX_METRICS_PER_WIDGET):
+        chunk = dimensions[start:start + MAX_METRICS_PER_WIDGET]
+        stat = metric.statistic()
+        widgets.append({ "type": "metric"
+                       , "width": 12
+                       , "height": 6
+                       , "properties": {
+                           "title": "%s %s" % (stat, metric)
+                         , "region": "${AWS::Region}"
+                         , "stat": stat
+                         , "period": self._period
+                         , "metrics": [ [ metric.namespace(), str(metric)
+                                        , metric.dimension(), "${" + d + "}" ]
+                                        for d in chunk ]
+                         }
+                       })
+    return Dashboard(
+        "MonitoringDashboard"
+      , DashboardName = Sub("${AWS::StackName}-monitoring")
+      , DashboardBody = Sub(json.dumps({ "widgets": widgets }))
+      )
+
+  # (resource, [(metric, threshold)]) for every monitored resource
+  def _plan(self) -> list:
+    if self._template is None:
+      raise ValueError("MonitoringBuilder needs a template")
+    plan = []
+    for resource in list(self._template.resources.values()):
+      metrics = METRICS_BY_TYPE.get(resource.resource_type)
+      if metrics is None:
+        continue
+      alarms = []
+      for metric in metrics:
+        threshold = self._thresholds.get((resource.title, metric), False)
+        if threshold is None:
+          continue
+        if threshold is False:
+          threshold = _defaultThreshold(metric, resource)
+        alarms.append((metric, threshold))
+      if alarms:
+        plan.append((resource, alarms))
+    return plan
+
+  def _build(self, plan: list) -> List[AWSObject]:
+    resources = []
+    monitored: Dict[AlarmMetric, List[str]] = {}
+    for resource, alarms in plan:
+      rule = None
+      for metric, threshold in alarms:
+        if metric == AlarmMetric.PipelineFailures:
+          rule = self._failureRule(resource)
+          resources.append(rule)
+        target = rule if rule is not None else resource
+        resources.append(self._alarm(resource, metric, threshold, Ref(target)))
+        monitored.setdefault(metric, []).append(target.title)
+    if self._dashboard and monitored:
+      resources.append(self._buildDashboard(monitored))
+    return resources
+
+  def build(self) -> List[AWSObject]:
+    return self._build(self._plan())
+
+  # adds the monitoring resources to the scanned template; a template holds
+  # at most MAX_RESOURCES resources, so larger stacks need buildTemplates
+  def addToTemplate(self) -> Template:
+    resources = self.build()
+    if len(self._template.resources) + len(resources) > MAX_RESOURCES:
+      raise ValueError("%d monitoring resources do not fit into the template, "
+                       "use buildTemplates and buildNestedStacks instead" % len(resources))
+    for resource in resources:
+      self._template.add_resource(resource)
+    return self._template
+
+  # splits the plan so every chunk stays below the resource and parameter
+  # limits of a template, counting the failure rules and the dashboard
+  def _chunks(self) -> List[list]:
+    chunks, chunk, size = [], [], 1 if self._dashboard else 0
+    for entry in self._plan():
+      resource, alarms = entry
+      count = len(alarms) + sum(1 for m, _ in alarms if m == AlarmMetric.PipelineFailures)
+      if chunk and (len(chunk) + 1 > MAX_PARAMETERS or size + count > MAX_RESOURCES):
+        chunks.append(chunk)
+        chunk, size = [], 1 if self._dashboard else 0
+      chunk.append(entry)
+      size += count
+    if chunk:
+      chunks.append(chunk)
+    return chunks
+
+  # separate monitoring templates; each takes the names of its monitored
+  # resources as parameters named like their logical ids and gets its own
+  # dashboard, deploy them with buildNestedStacks or pass the names directly
+  def buildTemplates(self) -> List[Template]:
+    templates = []
+    for chunk in self._chunks():
+      template = Template()
+      for resource, _ in chunk:
+        template.add_parameter(Parameter(
+            resource.title
+          , Type = "String"
+          , Description = "Name of " + resource.title
+          ))
+      template.add_resource(self._build(chunk))
+      templates.append(template)
+    return templates
+
+  # AWS::CloudFormation::Stack resources for the scanned template, one per
+  # template of buildTemplates uploaded to the matching url
+  def buildNestedStacks(self, templateUrls: List[str]) -> List[Stack]:
+    chunks = self._chunks()
+    if len(templateUrls) != len(chunks):
+      raise ValueError("Expected %d template urls, got %d" % (len(chunks), len(templateUrls)))
+    return [ Stack( "Monitoring%d" % i
+                  , TemplateURL = url
+                  , Parameters = { r.title: Ref(r) for r, _ in chunk }
+                  )
+             for i, (chunk, url) in enumerate(zip(chunks, templateUrls)) ]
@@ -0,0 +1,123 @@
+from typing import Iterator, Tuple
+
+
+# immutable vector sharing its prefix with the vector it was appended to;
+# append is O(1), iteration materializes once and caches the tuple
+class PersistentVector:
+  __slots__ = ("_head", "_tail", "_length", "_items")
+
+  def __init__(self, head = None, tail: "PersistentVector" = None, length: int = 0):
+    self._head = head
+    self._tail = tail
+    self._length = length
+    self._items = None
+
+  def append(self, item) -> "PersistentVector":
+    return PersistentVector(item, self, self._length + 1)
+
+  def extend(self, items) -> "PersistentVector":
+    vector = self
+    for item in items:
+      vector = vector.append(item)
+    return vector
+
+  def toTuple(self) -> Tuple:
+    if self._items is None:
+      items = []
+      node = self
+      while node._length:
+        items.append(node._head)
+        node = node._tail
+      items.reverse()
+      self._items = tuple(items)
+    return self._items
+
+  def toList(self) -> list:
+    return list(self.toTuple())
+
+  def __len__(self) -> int:
+    return self._length
+
+  def __iter__(self) -> Iterator:
+    return iter(self.toTuple())
+
+  def __repr__(self) -> str:
+    return "PersistentVector(" + repr(list(self)) + ")"
+
+
+EMPTY_VECTOR = PersistentVector()
+
+
+# immutable map stored as a chain of assignments on top of a frozen dict;
+# set is O(1) and shares the chain, chains longer than COMPACT_DEPTH are
+# folded into a new base so lookups stay bounded
+class PersistentMap:
+  __slots__ = ("_key", "_value", "_parent", "_base", "_depth", "_dict")
+
+  COMPACT_DEPTH = 32
+  _MISSING = object()
+
+  def __init__(self, base: dict = None):
+    self._key = None
+    self._value = None
+    self._parent = None
+    self._base = dict(base or {})
+    self._depth = 0
+    self._dict = None
+
+  def set(self, key, value) -> "PersistentMap":
+    if self._depth >= PersistentMap.COMPACT_DEPTH:
+      return PersistentMap(self.toDict()).set(key, value)
+    node = PersistentMap.__new__(PersistentMap)
+    node._key = key
+    node._value = value
+    node._parent = self
+    node._base = None
+    node._depth = self._depth + 1
+    node._dict = None
+    return node
+
+  def update(self, items: dict) -> "PersistentMap":
+    node = self
+    for key, value in items.items():
+      node = node.set(key, value)
+    return node
+
+  def get(self, key, default = None):
+    node = self
+    while node._parent is not None:
+      if node._key == key:
+        return node._value
+      node = node._parent
+    return node._base.get(key, default)
+
+  def __contains__(self, key) -> bool:
+    return self.get(key, PersistentMap._MISSING) is not PersistentMap._MISSING
+
+  def toDict(self) -> dict:
+    if self._dict is None:
+      chain = []
+      node = self
+      while node._parent is not None:
+        chain.append(node)
+        node = node._parent
+      result = dict(node._base)
+      for n in reversed(chain):
+        result[n._key] = n._value
+      self._dict = result
+    return dict(self._dict)
+
+  def items(self):
+    return self.toDict().items()
+
+  def __len__(self) -> int:
+    return len(self.toDict())
+
+  def __iter__(self) -> Iterator:
+    return iter(self.toDict())
+
+  def __repr__(self) -> str:
+    return "PersistentMap(" + repr(self.toDict()) + ")"
+
+
+EMPTY_MAP = PersistentMap()
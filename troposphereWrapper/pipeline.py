@@ -1,12 +1,37 @@
 from .helpers import checkForNoneValues
-from troposphere import Parameter, Ref, Template, Sub, GetAtt
+from troposphere import Parameter, Ref, Template, Sub, GetAtt, Join, AWSObject
 from troposphere.iam import Role
+from troposphere.events import Rule, Target
 import troposphere.s3 as s3
 from troposphere.codepipeline import (
-  Pipeline, Stages, Actions, ActionTypeID, OutputArtifacts, InputArtifacts,
-  ArtifactStore, DisableInboundStageTransitions)
+  Pipeline, Stages, Actions, ActionTypeId, OutputArtifacts, InputArtifacts,
+  ArtifactStore, DisableInboundStageTransitions, VariableDeclaration,
+  PipelineTriggerDeclaration, GitConfiguration, GitPushFilter,
+  GitPullRequestFilter, GitBranchFilterCriteria, GitFilePathFilterCriteria,
+  GitTagFilterCriteria)
+
+from .iam import RoleBuilder, RoleBuilderHelper
 
 from enum import Enum
+from typing import List
+import re
+
+
+class PipelineType(Enum):
+  V1 = (1, "V1")
+  V2 = (2, "V2")
+  def __str__(self):
+    return self.value[1]
+
+class ExecutionMode(Enum):
+  Queued     = (1, "QUEUED")
+  Parallel   = (2, "PARALLEL")
+  Superseded = (3, "SUPERSEDED")
+  def __str__(self):
+    return self.value[1]
+
+# the only source action provider pipeline triggers can be attached to
+TRIGGER_PROVIDER = "CodeStarSourceConnection"
 
 class PipelineBuilder:
   def __init__(self):
@@ -15,7 +40,11 @@ class PipelineBuilder:
     self._artStorage: ArtifactStore = None
     self._codePipelineServiceRole: Role = None
     self._disableInboundStageTransitions: list = []
-  
+    self._pipelineType: PipelineType = PipelineType.V1
+    self._executionMode: ExecutionMode = ExecutionMode.Superseded
+    self._variables: List[VariableDeclaration] = []
+    self._triggers: List[PipelineTriggerDeclaration] = []
+
   def addDisableInboundStageTrans(self, dist: DisableInboundStageTransitions):
     self._disableInboundStageTransitions.append(dist)
     return self
@@ -36,15 +65,194 @@ class PipelineBuilder:
     self._stages.append(stage)
     return self
 
+  def setPipelineType(self, pipelineType: PipelineType):
+    self._pipelineType = pipelineType
+    return self
+
+  def setExecutionMode(self, mode: ExecutionMode):
+    self._executionMode = mode
+    return self
+
+  def addVariable(self, variable: VariableDeclaration):
+    self._variables.append(variable)
+    return self
+
+  def addTrigger(self, trigger: PipelineTriggerDeclaration):
+    self._triggers.append(trigger)
+    return self
+
+  def _validate(self):
+    if self._pipelineType == PipelineType.V1:
+      if self._executionMode != ExecutionMode.Superseded:
+        raise ValueError("V1 pipelines only support execution mode "
+                         + str(ExecutionMode.Superseded))
+      if self._variables:
+        raise ValueError("Pipeline variables require pipeline type V2")
+      if self._triggers:
+        raise ValueError("Pipeline triggers require pipeline type V2")
+    names = [ v.Name for v in self._variables ]
+    if len(names) != len(set(names)):
+      raise ValueError("Duplicate pipeline variable names: " + str(names))
+    if len(self._variables) > 50:
+      raise ValueError("A pipeline supports at most 50 variables")
+    if len(self._triggers) > 50:
+      raise ValueError("A pipeline supports at most 50 triggers")
+    # action names are usually Sub objects, so they are compared as dicts
+    actions = [ (a.Name.to_dict() if hasattr(a.Name, "to_dict") else a.Name
+                , a.ActionTypeId.Provider)
+                for s in self._stages for a in s.Actions
+                if a.ActionTypeId.Category == str(ActionIdCategory.Source) ]
+    for t in self._triggers:
+      name = t.GitConfiguration.SourceActionName
+      name = name.to_dict() if hasattr(name, "to_dict") else name
+      providers = [ p for n, p in actions if n == name ]
+      if not providers:
+        raise ValueError("Trigger references unknown source action: " + str(name))
+      if providers[0] != TRIGGER_PROVIDER:
+        raise ValueError("Triggers require a " + TRIGGER_PROVIDER + " source action, "
+                         + str(name) + " uses " + str(providers[0]))
+
   def build(self) -> Pipeline:
     checkForNoneValues(self)
-    return Pipeline( 
+    self._validate()
+    pipeline = Pipeline(
         self._name
       , RoleArn = GetAtt(self._codePipelineServiceRole, "Arn")
       , Stages = self._stages
       , ArtifactStore = self._artStorage
       , DisableInboundStageTransitions = self._disableInboundStageTransitions
       )
+    if self._pipelineType == PipelineType.V2:
+      pipeline.PipelineType = str(self._pipelineType)
+      pipeline.ExecutionMode = str(self._executionMode)
+      if self._variables:
+        pipeline.Variables = self._variables
+      if self._triggers:
+        pipeline.Triggers = self._triggers
+    return pipeline
+
+
+class CodePipelineVariableBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._defaultValue: str = None
+    self._description: str = None
+
+  def setName(self, name: str):
+    if not re.fullmatch(r"[A-Za-z0-9@\-_]{1,128}", name):
+      raise ValueError("Invalid pipeline variable name: " + name)
+    self._name = name
+    return self
+
+  def setDefaultValue(self, value: str):
+    self._defaultValue = value
+    return self
+
+  def setDescription(self, description: str):
+    self._description = description
+    return self
+
+  def build(self) -> VariableDeclaration:
+    checkForNoneValues(self, optional = ["_defaultValue", "_description"])
+    variable = VariableDeclaration( Name = self._name )
+    if self._defaultValue is not None:
+      variable.DefaultValue = self._defaultValue
+    if self._description is not None:
+      variable.Description = self._description
+    return variable
+
+
+class CodePipelineTriggerBuilder:
+  def __init__(self):
+    self._sourceActionName: str = None
+    self._includedBranches: List[str] = []
+    self._excludedBranches: List[str] = []
+    self._includedFilePaths: List[str] = []
+    self._excludedFilePaths: List[str] = []
+    self._includedTags: List[str] = []
+    self._excludedTags: List[str] = []
+    self._pullRequestEvents: List[str] = []
+
+  def setSourceAction(self, action: Actions):
+    self._sourceActionName = action.Name
+    return self
+
+  def addIncludedBranch(self, pattern: str):
+    self._includedBranches.append(pattern)
+    return self
+
+  def addExcludedBranch(self, pattern: str):
+    self._excludedBranches.append(pattern)
+    return self
+
+  def addIncludedFilePath(self, pattern: str):
+    self._includedFilePaths.append(pattern)
+    return self
+
+  def addExcludedFilePath(self, pattern: str):
+    self._excludedFilePaths.append(pattern)
+    return self
+
+  def addIncludedTag(self, pattern: str):
+    self._includedTags.append(pattern)
+    return self
+
+  def addExcludedTag(self, pattern: str):
+    self._excludedTags.append(pattern)
+    return self
+
+  def addPullRequestEvent(self, event: str):
+    if event not in ("OPEN", "UPDATED", "CLOSED"):
+      raise ValueError("Invalid pull request event: " + event)
+    self._pullRequestEvents.append(event)
+    return self
+
+  def _criteria(self, cls, includes: List[str], excludes: List[str]):
+    for xs in (includes, excludes):
+      if len(xs) > 8:
+        raise ValueError("Trigger filters support at most 8 patterns: " + str(xs))
+    if not includes and not excludes:
+      return None
+    criteria = cls()
+    if includes:
+      criteria.Includes = includes
+    if excludes:
+      criteria.Excludes = excludes
+    return criteria
+
+  def build(self) -> PipelineTriggerDeclaration:
+    checkForNoneValues(self)
+    branches = self._criteria( GitBranchFilterCriteria
+                             , self._includedBranches, self._excludedBranches)
+    filePaths = self._criteria( GitFilePathFilterCriteria
+                              , self._includedFilePaths, self._excludedFilePaths)
+    tags = self._criteria( GitTagFilterCriteria
+                         , self._includedTags, self._excludedTags)
+    if tags is not None and (branches is not None or filePaths is not None):
+      raise ValueError("Tag filters can not be combined with branch or file path filters")
+    if filePaths is not None and branches is None:
+      raise ValueError("File path filters require a branch filter")
+    config = GitConfiguration( SourceActionName = self._sourceActionName )
+    if self._pullRequestEvents:
+      if branches is None:
+        raise ValueError("Pull request filters require a branch filter")
+      pullRequest = GitPullRequestFilter( Events = self._pullRequestEvents
+                                        , Branches = branches
+                                        )
+      if filePaths is not None:
+        pullRequest.FilePaths = filePaths
+      config.PullRequest = [ pullRequest ]
+    else:
+      push = GitPushFilter()
+      for key, criteria in ( ("Branches", branches)
+                           , ("FilePaths", filePaths)
+                           , ("Tags", tags) ):
+        if criteria is not None:
+          setattr(push, key, criteria)
+      config.Push = [ push ]
+    return PipelineTriggerDeclaration( ProviderType = TRIGGER_PROVIDER
+                                     , GitConfiguration = config
+                                     )
 
 
 
@@ -114,18 +322,21 @@ class CodePipelineStageBuilder:
 class CodePipelineActionBuilder:
   def __init__(self):
     self._name: str = None
-    self._actionType: ActionTypeID = None
+    self._actionType: ActionTypeId = None
     self._output: OutputArtifacts = []
     self._input: InputArtifacts = []
     self._runOrder: str = "1"
     self._configuration: dict = {}
+    self._batchEnabled: bool = False
+    self._combineArtifacts: bool = False
+    self._eventDriven: bool = False
 
 
   def setName(self, name: str):
       self._name = name
       return self
 
-  def setActionType(self, at: ActionTypeID):
+  def setActionType(self, at: ActionTypeId):
       self._actionType = at
       return self
 
@@ -144,6 +355,43 @@ class CodePipelineActionBuilder:
       self._configuration = config
       return self
 
+  # configuration of a setCodeStarConnectionSource action, e.g.
+  # repository "owner/repo"; triggers filter on the pushed branches
+  def setConnectionSource(self, connectionArn: str, repository: str, branch: str):
+      self._configuration = dict( self._configuration
+                                , ConnectionArn = connectionArn
+                                , FullRepositoryId = repository
+                                , BranchName = branch
+                                )
+      return self
+
+  def enableCodeBuildBatch(self, combineArtifacts: bool = False):
+      self._batchEnabled = True
+      self._combineArtifacts = combineArtifacts
+      return self
+
+  # source changes are pushed by an EventBridge rule from
+  # PipelineSourceTriggerBuilder instead of being polled
+  def enableEventDrivenSource(self):
+      self._eventDriven = True
+      return self
+
+  def _buildConfiguration(self) -> dict:
+      config = dict(self._configuration)
+      if self._batchEnabled:
+        if self._actionType.Provider != "CodeBuild":
+          raise ValueError("Batch builds require a CodeBuild action, got: "
+                           + str(self._actionType.Provider))
+        config["BatchEnabled"] = "true"
+        config["CombineArtifacts"] = "true" if self._combineArtifacts else "false"
+      if self._eventDriven:
+        if self._actionType.Provider not in EVENT_SOURCE_PROVIDERS:
+          raise ValueError("Event driven sources require one of "
+                           + str(EVENT_SOURCE_PROVIDERS) + ", got: "
+                           + str(self._actionType.Provider))
+        config["PollForSourceChanges"] = "false"
+      return config
+
   def build(self) -> Actions:
       checkForNoneValues(self)
       return Actions( Name = Sub(self._name + "-${AWS::StackName}")
@@ -151,7 +399,7 @@ class CodePipelineActionBuilder:
                     , OutputArtifacts = self._output
                     , InputArtifacts = self._input
                     , RunOrder = self._runOrder
-                    , Configuration = self._configuration
+                    , Configuration = self._buildConfiguration()
                     )
 
 
@@ -203,6 +451,22 @@ class CodePipelineActionTypeIdBuilder:
         .setProvider("CodeCommit")
     return self
 
+  def setS3Source(self, version: str):
+    self.setCategory(ActionIdCategory.Source) \
+        .setOwner(ActionIdOwner.AWS) \
+        .setVersion(version) \
+        .setProvider("S3")
+    return self
+
+  # GitHub, GitLab or Bitbucket through a CodeConnections connection, the only
+  # source provider that supports pipeline triggers
+  def setCodeStarConnectionSource(self, version: str = "1"):
+    self.setCategory(ActionIdCategory.Source) \
+        .setOwner(ActionIdOwner.AWS) \
+        .setVersion(version) \
+        .setProvider(TRIGGER_PROVIDER)
+    return self
+
   def setCodeBuildSource(self, version: str):
     self.setCategory(ActionIdCategory.Build) \
         .setOwner(ActionIdOwner.AWS) \
@@ -210,15 +474,98 @@ class CodePipelineActionTypeIdBuilder:
         .setProvider("CodeBuild")
     return self
 
-  def build(self) -> ActionTypeID:
+  def build(self) -> ActionTypeId:
     checkForNoneValues(self)
-    return ActionTypeID( Category = str(self._category)
+    return ActionTypeId( Category = str(self._category)
                        , Owner = str(self._owner)
                        , Version = self._version
                        , Provider = self._provider
                        )
 
 
+EVENT_SOURCE_PROVIDERS = ("CodeCommit", "S3")
+
+
+class PipelineSourceTriggerBuilder:
+  def __init__(self):
+    self._name: str = None
+    self._pipeline: Pipeline = None
+    self._action: Actions = None
+
+  def setName(self, name: str):
+    self._name = name
+    return self
+
+  def setPipeline(self, pipeline: Pipeline):
+    self._pipeline = pipeline
+    return self
+
+  def setSourceAction(self, action: Actions):
+    self._action = action
+    return self
+
+  def _codeCommitPattern(self, config: dict) -> dict:
+    repositoryArn = Join("", [ "arn:aws:codecommit:"
+                             , Ref("AWS::Region"), ":"
+                             , Ref("AWS::AccountId"), ":"
+                             , config["RepositoryName"]
+                             ])
+    return { "source": [ "aws.codecommit" ]
+           , "detail-type": [ "CodeCommit Repository State Change" ]
+           , "resources": [ repositoryArn ]
+           , "detail": { "event": [ "referenceCreated", "referenceUpdated" ]
+                       , "referenceType": [ "branch" ]
+                       , "referenceName": [ config["BranchName"] ]
+                       }
+           }
+
+  # needs EventBridge notifications on the bucket, see S3Builder.enableEventBridge
+  def _s3Pattern(self, config: dict) -> dict:
+    return { "source": [ "aws.s3" ]
+           , "detail-type": [ "Object Created" ]
+           , "detail": { "bucket": { "name": [ config["S3Bucket"] ] }
+                       , "object": { "key": [ config["S3ObjectKey"] ] }
+                       }
+           }
+
+  def build(self) -> List[AWSObject]:
+    checkForNoneValues(self)
+    provider = self._action.ActionTypeId.Provider
+    config = self._action.properties.get("Configuration", {})
+    if provider not in EVENT_SOURCE_PROVIDERS:
+      raise ValueError("Event driven sources require one of "
+                       + str(EVENT_SOURCE_PROVIDERS) + ", got: " + str(provider))
+    if config.get("PollForSourceChanges") != "false":
+      raise ValueError("Source action still polls, build it with "
+                       "CodePipelineActionBuilder.enableEventDrivenSource()")
+    if provider == "CodeCommit":
+      pattern = self._codeCommitPattern(config)
+    else:
+      pattern = self._s3Pattern(config)
+
+    role = RoleBuilder() \
+      .setName(self._name + "Role") \
+      .setAssumePolicy(RoleBuilderHelper() \
+          .defaultAssumeRolePolicyDocument("events.amazonaws.com")) \
+      .addPolicy(RoleBuilderHelper().startPipelineExecutionPolicy(self._pipeline)) \
+      .build()
+    pipelineArn = Join("", [ "arn:aws:codepipeline:"
+                           , Ref("AWS::Region"), ":"
+                           , Ref("AWS::AccountId"), ":"
+                           , Ref(self._pipeline)
+                           ])
+    rule = Rule( self._name
+               , EventPattern = pattern
+               , State = "ENABLED"
+               , Targets = [ Target( Id = self._pipeline.title
+                                   , Arn = pipelineArn
+                                   , RoleArn = GetAtt(role, "Arn")
+                                   )
+                           ]
+               )
+    return [ role, rule ]
+
+
 class StageBuilderHelper:
   def _getStageNameWithoutStackNameRef(self, stage: Stages)-> str:
     name = stage.Name
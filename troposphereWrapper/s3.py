@@ -20,6 +20,7 @@ class S3Builder:
   def __init__(self):
     self._name = None
     self._access = None
+    self._eventBridge: bool = False
 
   def setName(self, name: str):
     self._name = name
@@ -29,10 +30,28 @@ class S3Builder:
     self._access = access
     return self
 
+  def enableEventBridge(self):
+    self._eventBridge = True
+    return self
+
+  # buckets without an access setting keep the CloudFormation default
+  def _accessControl(self) -> dict:
+    if self._access is None:
+      return {}
+    return dict( AccessControl = str(self._access) )
+
+  def _notifications(self) -> dict:
+    if not self._eventBridge:
+      return {}
+    return dict( NotificationConfiguration = NotificationConfiguration(
+        EventBridgeConfiguration = EventBridgeConfiguration( EventBridgeEnabled = True )
+      ))
+
   def build(self) -> Bucket:
     return Bucket( 
         self._name
-      , AccessControl = self._access
+      , **self._accessControl()
+      , **self._notifications()
       )
 
 
@@ -47,6 +66,7 @@ class S3StaticWebsiteBuilder(S3Builder):
       )
     return Bucket(
         self._name
-      , AccessControl = str(self._access)
+      , **self._accessControl()
       , WebsiteConfiguration = webConf
+      , **self._notifications()
     )
@@ -0,0 +1,293 @@
+from troposphere import Template
+
+from .synthcache import SynthesisCache
+from .validation import TemplateValidator
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+import time
+
+
+class StackDefinition(NamedTuple):
+  name: str
+  factory: str
+  source: str
+  files: List[str]
+
+
+_registry: Dict[str, StackDefinition] = {}
+
+
+# marks a zero-argument function returning a Template (or its JSON) as a
+# stack for the synth command; files are input files relative to the module
+def stack(name: str = None, files: List[str] = ()):
+  def register(fn):
+    module = sys.modules[fn.__module__]
+    source = os.path.abspath(module.__file__)
+    base = os.path.dirname(source)
+    _registry[fn.__module__ + ":" + fn.__qualname__] = StackDefinition(
+        name = name or fn.__name__
+      , factory = fn.__module__ + ":" + fn.__qualname__
+      , source = source
+      , files = [ os.path.join(base, f) for f in files ]
+      )
+    return fn
+  return register
+
+
+def _moduleName(root: str, path: str) -> str:
+  rel = os.path.relpath(path, root)[:-len(".py")]
+  parts = rel.split(os.sep)
+  if parts[-1] == "__init__":
+    parts = parts[:-1]
+  return ".".join(parts)
+
+
+def _sourceFiles(root: str) -> List[str]:
+  if os.path.isfile(root):
+    return [ root ]
+  found = []
+  for dirpath, dirnames, filenames in os.walk(root):
+    dirnames[:] = [ d for d in dirnames
+                    if not d.startswith(".") and d != "__pycache__" ]
+    found.extend(os.path.join(dirpath, f) for f in filenames if f.endswith(".py"))
+  return sorted(found)
+
+
+def _toIndex(stackDef: StackDefinition) -> dict:
+  base = os.path.dirname(stackDef.source)
+  return { "name": stackDef.name
+         , "factory": stackDef.factory
+         , "files": [ os.path.relpath(f, base) for f in stackDef.files ]
+         }
+
+
+def _fromIndex(entry: dict, source: str) -> StackDefinition:
+  base = os.path.dirname(source)
+  return StackDefinition( name = entry["name"]
+                        , factory = entry["factory"]
+                        , source = source
+                        , files = [ os.path.join(base, f) for f in entry["files"] ]
+                        )
+
+
+# imports every module below the given paths that uses the wrapper and
+# returns the stacks they registered; with a cache directory, modules whose
+# stacks are indexed under their current content are not imported at all
+def discover(paths: List[str], cacheDir: str = None) -> List[StackDefinition]:
+  cache = SynthesisCache(cacheDir) if cacheDir is not None else None
+  modules = {}
+  for path in paths:
+    path = os.path.abspath(path)
+    root = os.path.dirname(path) if os.path.isfile(path) else path
+    if root not in sys.path:
+      sys.path.insert(0, root)
+    for source in _sourceFiles(path):
+      with open(source, encoding = "utf-8") as f:
+        if "troposphereWrapper" not in f.read():
+          continue
+      modules.setdefault(source, _moduleName(root, source))
+  stacks = []
+  for source, module in modules.items():
+    # a module of the same name earlier on sys.path or already imported,
+    # e.g. stacks/site.py, would be imported instead of the file
+    spec = importlib.util.find_spec(module)
+    origin = spec.origin if spec is not None else None
+    if origin is None or os.path.realpath(origin) != os.path.realpath(source):
+      raise ValueError("%s is shadowed by module %s from %s" % (source, module, origin))
+    indexed = cache.getStacks(module, source) if cache is not None else None
+    if indexed is not None:
+      stacks.extend(_fromIndex(e, source) for e in indexed)
+      continue
+    importlib.import_module(module)
+    registered = [ s for s in _registry.values() if s.source == source ]
+    if cache is not None:
+      cache.putStacks(module, source, [ _toIndex(s) for s in registered ])
+    stacks.extend(registered)
+  return stacks
+
+
+def _render(factory: str) -> str:
+  module, _, function = factory.partition(":")
+  result = getattr(importlib.import_module(module), function)()
+  return result.to_json() if isinstance(result, Template) else result
+
+
+# hit is None without a cache; the counters of a worker's cache are lost,
+# so whether the render was a hit travels back with the result
+def _renderTimed(factory: str, files: List[str], cacheDir: str = None):
+  start = time.perf_counter()
+  hit = None
+  if cacheDir is not None:
+    cache = SynthesisCache(cacheDir)
+    template = cache.render(factory, files = files)
+    hit = cache._hits > 0
+  else:
+    template = _render(factory)
+  return factory, template, time.perf_counter() - start, hit
+
+
+def _initWorker(syspath: List[str]):
+  sys.path[:] = syspath
+
+
+def _write(outdir: str, stackDef: StackDefinition, template: str) -> str:
+  path = os.path.join(outdir, stackDef.name + ".json")
+  with open(path, "w") as f:
+    f.write(template)
+  return path
+
+
+def _report(timings: list, out = sys.stdout):
+  for stackDef, seconds, path, hit in sorted(timings, key = lambda t: -t[1]):
+    state = "" if hit is None else "  cached" if hit else "  rendered"
+    out.write("%9.1f ms  %s -> %s%s\n" % (seconds * 1000, stackDef.name, path, state))
+  hits = [ t[3] for t in timings if t[3] is not None ]
+  if hits:
+    out.write("cache: %d hits, %d misses\n" % (sum(hits), len(hits) - sum(hits)))
+  out.flush()
+
+
+# reference errors of the written templates, one line per error
+def _validate(timings: list, out = sys.stderr) -> int:
+  validator = TemplateValidator()
+  count = 0
+  for stackDef, _, path, _ in timings:
+    with open(path) as f:
+      errors = validator.validate(f.read())
+    for error in errors:
+      out.write("%s: %s\n" % (stackDef.name, error))
+    count += len(errors)
+  out.flush()
+  return count
+
+
+def synthesize( stacks: List[StackDefinition]
+              , outdir: str
+              , jobs: int = None
+              , cacheDir: str = None
+              ) -> list:
+  os.makedirs(outdir, exist_ok = True)
+  byFactory = { s.factory: s for s in stacks }
+  timings = []
+  if jobs == 1 or len(stacks) < 2:
+    results = [ _renderTimed(s.factory, s.files, cacheDir) for s in stacks ]
+  else:
+    with ProcessPoolExecutor( max_workers = jobs
+                            , initializer = _initWorker
+                            , initargs = (list(sys.path),)
+                            ) as pool:
+      results = list(pool.map( _renderTimed
+                             , [ s.factory for s in stacks ]
+                             , [ s.files for s in stacks ]
+                             , [ cacheDir ] * len(stacks)
+                             ))
+  for factory, template, seconds, hit in results:
+    stackDef = byFactory[factory]
+    timings.append((stackDef, seconds, _write(outdir, stackDef, template), hit))
+  return timings
+
+
+def _mtimes(paths: List[str]) -> dict:
+  mtimes = {}
+  for path in paths:
+    try:
+      mtimes[path] = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+      mtimes[path] = None
+  return mtimes
+
+
+# re-renders in this interpreter so unchanged modules stay imported
+def watch(paths: List[str], outdir: str, interval: float = 0.5):
+  stacks = discover(paths)
+  timings = synthesize(stacks, outdir, jobs = 1)
+  _report(timings)
+  _validate(timings)
+  watched = [ p for path in paths for p in _sourceFiles(os.path.abspath(path)) ]
+  watched += [ f for s in stacks for f in s.files ]
+  mtimes = _mtimes(watched)
+  while True:
+    time.sleep(interval)
+    current = _mtimes(watched)
+    changed = set(p for p in current if current[p] != mtimes.get(p))
+    mtimes = current
+    if not changed:
+      continue
+    stackSources = set(s.source for s in stacks)
+    helpers = [ m for m in list(sys.modules.values())
+                if getattr(m, "__file__", None)
+                and os.path.abspath(m.__file__) in changed - stackSources ]
+    if helpers:
+      # shared modules changed, every stack may depend on them
+      dirty = stacks
+    else:
+      dirty = [ s for s in stacks
+                if s.source in changed or changed.intersection(s.files) ]
+    reload = list(helpers) + \
+      list({ s.factory.partition(":")[0]: sys.modules[s.factory.partition(":")[0]]
+             for s in dirty if helpers or s.source in changed }.values())
+    try:
+      for module in reload:
+        importlib.reload(module)
+    except Exception as e:
+      sys.stderr.write("reload failed: %s\n" % e)
+      continue
+    stacks = [ _registry.get(s.factory, s) for s in stacks ]
+    dirty = [ _registry.get(s.factory, s) for s in dirty ]
+    try:
+      timings = synthesize(dirty, outdir, jobs = 1)
+      _report(timings)
+      _validate(timings)
+    except Exception as e:
+      sys.stderr.write("render failed: %s\n" % e)
+
+
+def main(argv: List[str] = None) -> int:
+  parser = argparse.ArgumentParser(
+      prog = "troposphere-synth"
+    , description = "Render stacks registered with troposphereWrapper.synth.stack"
+    )
+  parser.add_argument("paths", nargs = "+", help = "modules or directories with stacks")
+  parser.add_argument("-o", "--outdir", default = "templates", help = "template output directory")
+  parser.add_argument("-j", "--jobs", type = int, default = None, help = "parallel renderers")
+  parser.add_argument("-w", "--watch", action = "store_true", help = "re-render on changes")
+  parser.add_argument("--interval", type = float, default = 0.5, help = "watch poll interval")
+  parser.add_argument("--cache-dir", default = None, help = "use a synthesis cache directory")
+  parser.add_argument("--no-validate", action = "store_true", help = "skip reference validation")
+  args = parser.parse_args(argv)
+
+  if args.watch:
+    try:
+      watch(args.paths, args.outdir, args.interval)
+    except KeyboardInterrupt:
+      return 0
+    except ValueError as e:
+      sys.stderr.write(str(e) + "\n")
+      return 1
+  try:
+    stacks = discover(args.paths, args.cache_dir)
+  except ValueError as e:
+    sys.stderr.write(str(e) + "\n")
+    return 1
+  if not stacks:
+    sys.stderr.write("no stacks found\n")
+    return 1
+  start = time.perf_counter()
+  timings = synthesize(stacks, args.outdir, args.jobs, args.cache_dir)
+  _report(timings)
+  sys.stdout.write("%d stacks in %.1f ms\n" % (len(stacks), (time.perf_counter() - start) * 1000))
+  if not args.no_validate and _validate(timings):
+    return 1
+  return 0
+
+
+if __name__ == "__main__":
+  # run through the package module so stacks register in the same registry
+  from troposphereWrapper.synth import main as packageMain
+  sys.exit(packageMain())
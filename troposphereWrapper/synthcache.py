@@ -0,0 +1,240 @@
+from troposphere import Template
+
+from typing import List, Optional
+import glob
+import hashlib
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import sys
+import sysconfig
+import tempfile
+
+from . import __version__
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "troposphereWrapper")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _packageVersion(name: str) -> str:
+  try:
+    return importlib.metadata.version(name)
+  except importlib.metadata.PackageNotFoundError:
+    return "unknown"
+
+
+# the path is hashed relative to root so checkouts in different directories
+# share keys
+def _hashFile(digest, path: str, root: str):
+  digest.update(os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/").encode())
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(1 << 16), b""):
+      digest.update(chunk)
+
+
+def _moduleSource(module: str) -> str:
+  spec = importlib.util.find_spec(module)
+  if spec is None or spec.origin is None:
+    raise ValueError("Can not locate source of module " + module)
+  return spec.origin
+
+
+# modules below these directories are covered by the environment digest
+_LIBRARY_PATHS = tuple(
+    os.path.join(os.path.abspath(p), "")
+    for p in set( [ sysconfig.get_paths()[n]
+                    for n in ("stdlib", "platstdlib", "purelib", "platlib") ]
+                + [ os.path.dirname(os.path.abspath(__file__)) ] ))
+
+
+# sources of the loaded project modules; a superset of what one render used,
+# since modules imported by an earlier render in this process are shared
+def _localModuleFiles() -> List[str]:
+  files = set()
+  for module in list(sys.modules.values()):
+    path = getattr(module, "__file__", None)
+    if path and path.endswith(".py"):
+      path = os.path.abspath(path)
+      if not path.startswith(_LIBRARY_PATHS):
+        files.add(path)
+  return sorted(files)
+
+
+_environmentDigest = None
+
+# wrapper sources and library versions, computed once per process
+def _environment() -> bytes:
+  global _environmentDigest
+  if _environmentDigest is None:
+    digest = hashlib.sha256()
+    digest.update(__version__.encode())
+    for name in ("troposphere", "awacs"):
+      digest.update((name + "=" + _packageVersion(name)).encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(root, "*.py"))):
+      _hashFile(digest, path, root)
+    _environmentDigest = digest.digest()
+  return _environmentDigest
+
+
+class SynthesisCache:
+  def __init__(self, directory: str = None, maxBytes: int = DEFAULT_MAX_BYTES):
+    self._directory = directory \
+      or os.environ.get("TROPOSPHERE_WRAPPER_CACHE") \
+      or DEFAULT_CACHE_DIR
+    self._maxBytes = maxBytes
+    self._hits = 0
+    self._misses = 0
+    os.makedirs(self._directory, exist_ok = True)
+
+  # factory is "package.module:function"; the module is located but not imported
+  def key(self, factory: str, params: dict = None, files: List[str] = ()) -> str:
+    module, _, function = factory.partition(":")
+    if not function:
+      raise ValueError("Factory must be given as module:function, got " + factory)
+    digest = hashlib.sha256(_environment())
+    digest.update(factory.encode())
+    digest.update(json.dumps(params or {}, sort_keys = True, default = str).encode())
+    source = _moduleSource(module)
+    root = os.path.dirname(os.path.abspath(source))
+    _hashFile(digest, source, root)
+    for path in sorted(files, key = lambda f: os.path.relpath(os.path.abspath(f), root)):
+      _hashFile(digest, path, root)
+    return digest.hexdigest()
+
+  # the stacks a module registers are indexed by the module's content, so
+  # discovery can list them without importing the module
+  def _stacksKey(self, module: str, source: str) -> str:
+    digest = hashlib.sha256(_environment())
+    digest.update(("stacks:" + module + "\n").encode())
+    with open(source, "rb") as f:
+      digest.update(f.read())
+    return "stacks-" + digest.hexdigest()
+
+  def getStacks(self, module: str, source: str) -> Optional[List[dict]]:
+    path = self._path(self._stacksKey(module, source))
+    try:
+      with open(path) as f:
+        stacks = json.load(f)
+      os.utime(path)
+    except (FileNotFoundError, ValueError):
+      return None
+    return stacks
+
+  def putStacks(self, module: str, source: str, stacks: List[dict]):
+    return self.put(self._stacksKey(module, source), json.dumps(stacks))
+
+  def _path(self, key: str) -> str:
+    return os.path.join(self._directory, key + ".json")
+
+  def get(self, key: str) -> Optional[str]:
+    path = self._path(key)
+    try:
+      with open(path) as f:
+        template = f.read()
+      os.utime(path)
+    except FileNotFoundError:
+      self._misses += 1
+      return None
+    self._hits += 1
+    return template
+
+  # written to a temporary file first so readers never see partial templates
+  def put(self, key: str, template: str):
+    fd, tmp = tempfile.mkstemp(dir = self._directory, suffix = ".tmp")
+    try:
+      with os.fdopen(fd, "w") as f:
+        f.write(template)
+      os.replace(tmp, self._path(key))
+    except BaseException:
+      if os.path.exists(tmp):
+        os.remove(tmp)
+      raise
+    self._evict()
+    return self
+
+  def _entries(self) -> list:
+    entries = []
+    for entry in os.scandir(self._directory):
+      if not entry.name.endswith(".json"):
+        continue
+      try:
+        stat = entry.stat()
+      except FileNotFoundError:
+        continue
+      entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+  def _evict(self):
+    entries = sorted(self._entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+      if total <= self._maxBytes:
+        break
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      total -= size
+
+  # local modules a render imported, stored next to the entry relative to
+  # the factory module so the key can cover them before anything is imported
+  def _dependencies(self, key: str) -> Optional[List[str]]:
+    try:
+      with open(self._path("deps-" + key)) as f:
+        return json.load(f)
+    except (FileNotFoundError, ValueError):
+      return None
+
+  def _dependencyKey(self, key: str, dependencies: List[str], root: str) -> Optional[str]:
+    digest = hashlib.sha256(key.encode())
+    for dependency in dependencies:
+      try:
+        _hashFile(digest, os.path.join(root, dependency), root)
+      except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+  def render(self, factory: str, params: dict = None, files: List[str] = ()) -> str:
+    key = self.key(factory, params, files)
+    module, _, function = factory.partition(":")
+    root = os.path.dirname(os.path.abspath(_moduleSource(module)))
+    dependencies = self._dependencies(key)
+    fullKey = self._dependencyKey(key, dependencies, root) \
+      if dependencies is not None else None
+    if fullKey is not None:
+      template = self.get(fullKey)
+      if template is not None:
+        return template
+    else:
+      self._misses += 1
+    result = getattr(importlib.import_module(module), function)(**(params or {}))
+    template = result.to_json() if isinstance(result, Template) else result
+    dependencies = [ os.path.relpath(f, root).replace(os.sep, "/")
+                     for f in _localModuleFiles() ]
+    self.put("deps-" + key, json.dumps(dependencies))
+    fullKey = self._dependencyKey(key, dependencies, root)
+    if fullKey is not None:
+      self.put(fullKey, template)
+    return template
+
+  def clear(self):
+    for _, _, path in self._entries():
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+    return self
+
+  def stats(self) -> dict:
+    entries = self._entries()
+    lookups = self._hits + self._misses
+    return { "hits": self._hits
+           , "misses": self._misses
+           , "hitRate": self._hits / lookups if lookups else 0.0
+           , "entries": len(entries)
+           , "bytes": sum(size for _, size, _ in entries)
+           }
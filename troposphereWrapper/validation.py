@@ -0,0 +1,199 @@
+from troposphere import Template
+
+from .helpers import templateToDict
+
+from typing import Dict, List, Union
+import re
+
+
+# Fn::GetAtt attributes of the resource types this package builds or uses;
+# other types are not checked unless registered with addResourceAttributes
+GETATT_ATTRIBUTES: Dict[str, frozenset] = { t: frozenset(a) for t, a in {
+    "AWS::IAM::Role": ("Arn", "RoleId")
+  , "AWS::IAM::InstanceProfile": ("Arn",)
+  , "AWS::IAM::ManagedPolicy": ("PolicyArn",)
+  , "AWS::S3::Bucket": ( "Arn", "DomainName", "DualStackDomainName"
+                       , "RegionalDomainName", "WebsiteURL" )
+  , "AWS::S3::BucketPolicy": ()
+  , "AWS::Lambda::Function": ( "Arn", "SnapStartResponse"
+                             , "SnapStartResponse.ApplyOn"
+                             , "SnapStartResponse.OptimizationStatus" )
+  , "AWS::Lambda::LayerVersion": ("LayerVersionArn",)
+  , "AWS::Lambda::Permission": ()
+  , "AWS::Lambda::EventSourceMapping": ("Id", "EventSourceMappingArn")
+  , "AWS::CodeBuild::Project": ("Arn",)
+  , "AWS::CodeBuild::Fleet": ("Arn",)
+  , "AWS::CodePipeline::Pipeline": ("Version",)
+  , "AWS::Events::Rule": ("Arn",)
+  , "AWS::CloudFront::Distribution": ("DomainName", "Id")
+  , "AWS::CloudFront::CachePolicy": ("Id", "LastModifiedTime")
+  , "AWS::CloudFront::OriginRequestPolicy": ("Id", "LastModifiedTime")
+  , "AWS::CloudFront::OriginAccessControl": ("Id",)
+  , "AWS::CloudWatch::Alarm": ("Arn",)
+  , "AWS::CloudWatch::Dashboard": ()
+  , "AWS::SNS::Topic": ("TopicArn", "TopicName")
+  , "AWS::SQS::Queue": ("Arn", "QueueName", "QueueUrl")
+  , "AWS::Kinesis::Stream": ("Arn",)
+  , "AWS::DynamoDB::Table": ("Arn", "StreamArn")
+  }.items() }
+
+PSEUDO_PARAMETERS = frozenset([
+    "AWS::AccountId", "AWS::NotificationARNs", "AWS::NoValue", "AWS::Partition"
+  , "AWS::Region", "AWS::StackId", "AWS::StackName", "AWS::URLSuffix"
+  ])
+
+_SUB_VARIABLE = re.compile(r"\$\{([^!}][^}]*)\}")
+
+
+def _path(parts: list) -> str:
+  return ".".join(str(p) for p in parts)
+
+
+# checks Ref, Fn::GetAtt, Fn::Sub, DependsOn and Condition targets as well as
+# stage names and artifact flow of pipelines; the template is indexed once
+# and every node is visited once, so the cost is linear in its size
+class TemplateValidator:
+  def __init__(self):
+    self._attributes: Dict[str, frozenset] = dict(GETATT_ATTRIBUTES)
+
+  def addResourceAttributes(self, resourceType: str, attributes: List[str]):
+    self._attributes[resourceType] = \
+      self._attributes.get(resourceType, frozenset()) | frozenset(attributes)
+    return self
+
+  def validate(self, template: Union[Template, dict, str]) -> List[str]:
+    template = templateToDict(template)
+    resources = template.get("Resources", {})
+    self._types = { n: r.get("Type", "") for n, r in resources.items() }
+    self._refs = set(self._types) | set(template.get("Parameters", {})) | PSEUDO_PARAMETERS
+    self._conditions = set(template.get("Conditions", {}))
+    self._errors: List[str] = []
+    path = []
+
+    for section in ("Conditions", "Outputs"):
+      path.append(section)
+      self._walk(template.get(section, {}), path)
+      path.pop()
+
+    path.append("Resources")
+    for name, resource in resources.items():
+      path.append(name)
+      dependsOn = resource.get("DependsOn", [])
+      for target in [dependsOn] if isinstance(dependsOn, str) else dependsOn:
+        if target not in self._types:
+          self._error(path + ["DependsOn"], "depends on unknown resource " + target)
+      condition = resource.get("Condition")
+      if condition is not None and condition not in self._conditions:
+        self._error(path + ["Condition"], "unknown condition " + str(condition))
+      properties = resource.get("Properties", {})
+      path.append("Properties")
+      self._walk(properties, path)
+      if self._types[name] == "AWS::CodePipeline::Pipeline":
+        self._validatePipeline(properties, path)
+      path.pop()
+      path.pop()
+    path.pop()
+    return self._errors
+
+  def _error(self, path: list, message: str):
+    self._errors.append(_path(path) + ": " + message)
+
+  def _walk(self, value, path: list):
+    if isinstance(value, dict):
+      for key, item in value.items():
+        path.append(key)
+        if key == "Ref":
+          if isinstance(item, str) and item not in self._refs:
+            self._error(path, "reference to unknown resource or parameter " + item)
+        elif key == "Fn::GetAtt":
+          self._getAtt(item, path)
+        elif key == "Fn::Sub":
+          self._sub(item, path)
+        elif key == "Condition" and isinstance(item, str) and len(value) == 1:
+          if item not in self._conditions:
+            self._error(path, "unknown condition " + item)
+        else:
+          self._walk(item, path)
+        path.pop()
+    elif isinstance(value, list):
+      for i, item in enumerate(value):
+        path.append(i)
+        self._walk(item, path)
+        path.pop()
+
+  def _getAtt(self, item, path: list):
+    if isinstance(item, str):
+      item = item.split(".", 1)
+    if not isinstance(item, list) or len(item) != 2:
+      self._error(path, "Fn::GetAtt needs a logical id and an attribute")
+      return
+    name, attribute = item
+    if name not in self._types:
+      self._error(path, "attribute of unknown resource " + str(name))
+    elif isinstance(attribute, str):
+      self._checkAttribute(name, attribute, path)
+    else:
+      self._walk(attribute, path)
+
+  def _checkAttribute(self, name: str, attribute: str, path: list):
+    allowed = self._attributes.get(self._types[name])
+    if allowed is not None and attribute not in allowed:
+      self._error(path, "%s (%s) has no attribute %s"
+                  % (name, self._types[name], attribute))
+
+  def _sub(self, item, path: list):
+    text, variables = (item[0], item[1]) if isinstance(item, list) else (item, {})
+    if isinstance(variables, dict):
+      path.append(1)
+      self._walk(variables, path)
+      path.pop()
+    if not isinstance(text, str):
+      return
+    for variable in _SUB_VARIABLE.findall(text):
+      if variable in variables or variable in self._refs:
+        continue
+      name, _, attribute = variable.partition(".")
+      if name not in self._types:
+        self._error(path, "substitution of unknown resource or parameter " + variable)
+      elif attribute:
+        self._checkAttribute(name, attribute, path)
+      else:
+        self._error(path, "substitution of unknown resource or parameter " + variable)
+
+  def _validatePipeline(self, properties: dict, path: list):
+    stages = properties.get("Stages", [])
+    stageNames = set()
+    produced = set()
+    for s, stage in enumerate(stages if isinstance(stages, list) else []):
+      name = stage.get("Name")
+      stagePath = path + ["Stages", s]
+      if name in stageNames:
+        self._error(stagePath + ["Name"], "duplicate stage name " + str(name))
+      stageNames.add(name)
+      # actions of a stage only see artifacts of actions with a lower RunOrder
+      actions = stage.get("Actions", [])
+      byOrder: Dict[int, list] = {}
+      for a, action in enumerate(actions if isinstance(actions, list) else []):
+        order = action.get("RunOrder", 1)
+        order = int(order) if str(order).isdigit() else 1
+        byOrder.setdefault(order, []).append((a, action))
+      for order in sorted(byOrder):
+        outputs = []
+        for a, action in byOrder[order]:
+          actionPath = stagePath + ["Actions", a]
+          for i, artifact in enumerate(action.get("InputArtifacts", [])):
+            if artifact.get("Name") not in produced:
+              self._error(actionPath + ["InputArtifacts", i, "Name"]
+                         , "artifact %s is not produced by an earlier action"
+                           % artifact.get("Name"))
+          for i, artifact in enumerate(action.get("OutputArtifacts", [])):
+            if artifact.get("Name") in produced or artifact.get("Name") in outputs:
+              self._error(actionPath + ["OutputArtifacts", i, "Name"]
+                         , "artifact %s is produced more than once" % artifact.get("Name"))
+            outputs.append(artifact.get("Name"))
+        produced.update(outputs)
+    transitions = properties.get("DisableInboundStageTransitions", [])
+    for i, transition in enumerate(transitions):
+      if transition.get("StageName") not in stageNames:
+        self._error(path + ["DisableInboundStageTransitions", i, "StageName"]
+                   , "stage %s is not part of the pipeline" % transition.get("StageName"))